@@ -1,19 +1,25 @@
-from graph_builder import build_graph
+from graph_builder import get_graph
+from graph_nodes import get_llm_with_tools
+from llm_clients import preconnect
+from history import get_encoding
+from concept_index import get_concept_index
+from prerequisites import get_prerequisite_graph
+from question_bank import get_question_bank
 from prompts import *
-from langgraph.checkpoint.memory import MemorySaver
 from agent_tools import *
 from prompts import PERSONALIZED_NARRATOR_PROMPT
 
 import json
-from random import choice
+import time
+from langchain_core.messages import AIMessage, HumanMessage
+from metrics import record_turn
+from response_cache import get_response_cache, section_key
+from personas import get_persona_registry
+from llm_scheduler import per_session
+from tracing import get_tracing_handler, span
+import config
+import db
 
-with open("../profiles/students.json", "r") as f:
-    data = json.load(f)
-
-student = choice(data)
-persona = student['persona']
-
-memory = MemorySaver()
 # def agent(message: str, context: dict={}):
 #     graph = build_graph()
 #     print("user message is",message)
@@ -38,18 +44,184 @@ memory = MemorySaver()
 #     return response
 
 
-def agent(message: str, context: dict={}):
-    graph = build_graph()
+def warm_up(connect: bool = True):
+    """
+    Build everything a chat turn needs ahead of the first request.
+
+    Args:
+        connect (bool): Also open a pooled connection to the LLM provider. Defaults to True.
+    """
+    get_graph()
+    get_llm_with_tools()
+    get_question_llm()
+    get_encoding()
+    get_persona_registry()
+    try:
+        if config.RETRIEVAL_BACKEND == "numpy" and not get_concept_index().last_refresh:
+            get_concept_index().refresh(full=True)
+        get_prerequisite_graph()
+        get_question_bank()
+    except Exception as e:
+        print(f"Could not load the knowledge base: {str(e)}")
+    if connect:
+        preconnect()
+        if config.GRAPH_STORE == "neo4j":
+            # Opens the first pooled connection and reports a bad neo4j.txt at startup
+            print(f"Neo4j health check: {db.health_check()}")
+
+
+def build_turn_input(message: str, context: dict) -> dict:
+    """Build the graph input for one student message"""
+    topic ={"role": "system", "content": context["topic"]}
+    user_message = {"role": "user", "content": message}
+    return {"messages": [topic, user_message]}
+
+
+def count_turn_llm_calls(messages: list) -> int:
+    """Count the chatbot calls of the latest turn (every AI message after the last student message)"""
+    calls = 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, AIMessage):
+            calls += 1
+    return calls
+
+
+def build_run_config(session_id: str, student_id: str = None) -> dict:
+    """Graph config for one turn: the conversation thread and the student it is with"""
+    persona = get_persona_registry().resolve(student_id, session_id)
+    return {"configurable": {"thread_id": session_id, "student_id": persona.id},
+            "callbacks": [get_tracing_handler()]}
+
+
+def check_response_cache(graph, run_config: dict, message: str, context: dict):
+    """
+    Look up a cached answer for the first turn of a conversation.
+
+    Returns:
+        tuple: (cached answer or None, cache key to store the answer under on a miss or None
+        when the cache does not apply to this turn)
+    """
+    if not config.RESPONSE_CACHE_ENABLED or graph.get_state(run_config).values.get("messages"):
+        return None, None
+    key = (section_key(context), run_config["configurable"]["student_id"], get_query_embedding(message))
+    return get_response_cache().lookup(*key), key
+
+
+def record_cached_turn(graph, run_config: dict, msg: dict, answer: str):
+    """Add a cached answer to the conversation as if the graph had produced it"""
+    graph.update_state(run_config, {"messages": msg["messages"] + [AIMessage(content=answer)]}, as_node="narrator")
+
+
+@per_session
+def run_turn(message: str, context: dict={}, session_id: str = "default", student_id: str = None) -> dict:
+    """
+    Answer one student message and report how the answer was produced.
+
+    Returns:
+        dict: {"response": the answer, "metrics": the turn metrics from `record_turn`}
+    """
+    graph = get_graph()
     print("user message is",message)
     # print("context is", context)
+    started = time.perf_counter()
+    mode = config.PERSONALIZATION_MODE
     
-    topic ={"role": "system", "content": context["topic"]}
-    user_message = {"role": "user", "content": message}
-    msg = {"messages": [topic, user_message]}
-    response = graph.invoke(msg,{"configurable": {"thread_id": "1"}})
+    msg = build_turn_input(message, context)
+    run_config = build_run_config(session_id, student_id)
+    cached, cache_key = check_response_cache(graph, run_config, message, context)
+    if cached is not None:
+        record_cached_turn(graph, run_config, msg, cached)
+        metrics = record_turn(session_id, "cache", time.perf_counter() - started, 0)
+        return {"response": cached, "metrics": metrics}
+
+    result = graph.invoke(msg,run_config)
     # print("response is", response)
-    response = response["messages"][-1].content
-    print("----------- response is--------", response)  
-    personality = {json.dumps(persona, indent=4)}
-    personalized_narration = create_personalized_narration(response, personality)
-    return personalized_narration 
\ No newline at end of file
+    response = result["messages"][-1].content
+    llm_calls = count_turn_llm_calls(result["messages"])
+    # print("----------- response is--------", response)
+    if mode == "post":
+        personality = get_persona_registry().get(run_config["configurable"]["student_id"]).profile_json
+        with span("node", "post_narration"):
+            response = create_personalized_narration(response, personality)
+        path = "post"
+        llm_calls += 1
+    elif mode == "node":
+        path = "node" if result.get("narrated") else "node-skipped"
+        llm_calls += 1 if result.get("narrated") else 0
+    else:
+        path = "inline"
+    if cache_key is not None:
+        get_response_cache().store(*cache_key, response)
+    metrics = record_turn(session_id, path, time.perf_counter() - started, llm_calls)
+    return {"response": response, "metrics": metrics}
+
+
+def agent(message: str, context: dict={}, session_id: str = "default", student_id: str = None):
+    return run_turn(message, context, session_id, student_id)["response"]
+
+
+@per_session
+def agent_stream(message: str, context: dict={}, session_id: str = "default", student_id: str = None):
+    """
+    Run one chat turn and yield (event, data) pairs as the turn progresses.
+
+    Events are "status" (stage changes), "tool" (tool call started / finished),
+    "token" (a piece of the final answer) and "done" (the full answer and turn metrics).
+    """
+    graph = get_graph()
+    run_config = build_run_config(session_id, student_id)
+    started = time.perf_counter()
+    mode = config.PERSONALIZATION_MODE
+
+    msg = build_turn_input(message, context)
+    cached, cache_key = check_response_cache(graph, run_config, message, context)
+    if cached is not None:
+        record_cached_turn(graph, run_config, msg, cached)
+        yield "token", {"text": cached}
+        metrics = record_turn(session_id, "cache", time.perf_counter() - started, 0)
+        yield "done", {"response": cached, "metrics": metrics}
+        return
+
+    yield "status", {"stage": "thinking"}
+    for chunk, metadata in graph.stream(msg, run_config, stream_mode="messages"):
+        node = metadata.get("langgraph_node")
+        if node == "chatbot":
+            for tool_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                if tool_chunk.get("name"):
+                    yield "tool", {"name": tool_chunk["name"], "status": "start"}
+            # Inline answers are already personalized, so they go out as they are generated
+            if mode == "inline" and chunk.content:
+                yield "token", {"text": chunk.content}
+        elif node == "narrator" and chunk.content:
+            yield "token", {"text": chunk.content}
+        elif node == "tools":
+            yield "tool", {"name": chunk.name, "status": "end"}
+
+    values = graph.get_state(run_config).values
+    response = values["messages"][-1].content
+    llm_calls = count_turn_llm_calls(values["messages"])
+    if mode == "post":
+        yield "status", {"stage": "personalizing"}
+        personality = get_persona_registry().get(run_config["configurable"]["student_id"]).profile_json
+        personalized_narration = ""
+        with span("node", "post_narration"):
+            for token in stream_personalized_narration(response, personality):
+                personalized_narration += token
+                yield "token", {"text": token}
+        response = personalized_narration
+        path = "post"
+        llm_calls += 1
+    elif mode == "node":
+        path = "node" if values.get("narrated") else "node-skipped"
+        llm_calls += 1 if values.get("narrated") else 0
+        if not values.get("narrated"):
+            # The chatbot's answer was held back in case the narrator replaced it
+            yield "token", {"text": response}
+    else:
+        path = "inline"
+    if cache_key is not None:
+        get_response_cache().store(*cache_key, response)
+    metrics = record_turn(session_id, path, time.perf_counter() - started, llm_calls)
+    yield "done", {"response": response, "metrics": metrics}
@@ -6,11 +6,16 @@ from langgraph.prebuilt import ToolNode
 # Import things that are needed generically
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool, StructuredTool, tool
-from db import driver
+from graph_store import get_graph_store
+from tracing import span, count_tokens
+from functools import lru_cache
+from llm_clients import get_chat_model, get_openai_client
+from embedding_cache import get_embedding_cache
+from concept_index import get_concept_index
+from prerequisites import get_learning_path
+from question_bank import get_question_bank
+import config
 from prompts import QUERY_CREATOR_PROMPT, PERSONALIZED_NARRATOR_PROMPT
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
@@ -23,12 +28,11 @@ class FoundationConceptFetcher(BaseModel):
     def _run(self, topic: str):
         related_concepts = f""" Related Concepts for {topic} are:
         """
-        concept_name, concept_description = find_similar_documents(topic)
-        for name,concept in zip(concept_name,concept_description):
+        for name, concept in find_similar_documents(topic):
             related_concepts += f"""
             {name} - {concept}
             """
-        print("related_concepts is", related_concepts)
+        # print("related_concepts is", related_concepts)
         return related_concepts
 
 class QuestionCreator(BaseModel):
@@ -38,10 +42,30 @@ class QuestionCreator(BaseModel):
     foundation_concepts: str = Field(description="The foundation concepts to create questions for")
 
     def _run(self, foundation_concepts: str):
-        questions = create_questions(foundation_concepts)
+        # Serve the questions generated at ingest time; only concepts without a bank need a live LLM call
+        questions, unmatched = get_question_bank().questions_for(foundation_concepts)
+        if unmatched:
+            questions = questions + create_questions(", ".join(unmatched))
         questions_combined = "\n".join(questions)
         return f"The question for {foundation_concepts} is {questions_combined}"   
 
+class PrerequisiteFinder(BaseModel):
+    """
+    This tool is used to get the learning path for a concept: every concept the student needs to know first, in the order they should be learnt.
+    """
+    concept: str = Field(description="The concept for which the learning path is to be fetched")
+
+    def _run(self, concept: str):
+        path = get_learning_path(concept)
+        if path is None:
+            # Not a known concept name, use the closest concept instead
+            similar = find_similar_documents(concept, top_n=1)
+            path = get_learning_path(similar[0][0]) if similar else None
+        if not path:
+            return f"No prerequisites found for {concept}"
+        steps = "\n".join(f"{i + 1}. {step['concept_name']}" for i, step in enumerate(path))
+        return f"The learning path for {path[-1]['concept_name']} is:\n{steps}"
+
 class PersonalizedNarrator(BaseModel):
     """
     This tool is used to create a personalized narration based on the student's profile.
@@ -49,48 +73,59 @@ class PersonalizedNarrator(BaseModel):
     message: str = Field(description="The message to be narrated")
     profile: str = Field(description="The profile of the student")
 
-    def _run(self, topic: str, profile: str):
-        personalized_narration = create_personalized_narration(topic, profile)
-        return f"The personalized narration for {topic} is {personalized_narration}"
+    def _run(self, message: str, profile: str):
+        personalized_narration = create_personalized_narration(message, profile)
+        return f"The personalized narration for {message} is {personalized_narration}"
 
 # Function to generate embeddings from OpenAI
-def generate_openai_embedding(text):
+def request_openai_embedding(text):
     # Call OpenAI API to get embedding for the given text
-    response = client.embeddings.create(
-        model="text-embedding-ada-002",  # You can choose another available model
-        input=text
-    )
+    with span("llm", config.EMBEDDING_MODEL):
+        response = get_openai_client().embeddings.create(
+            model=config.EMBEDDING_MODEL,  # You can choose another available model
+            input=text
+        )
+    count_tokens(config.EMBEDDING_MODEL, response.usage.prompt_tokens if response.usage else 0)
     # Extract the embedding vector (a list of floats)
     return response.data[0].embedding
 
+def get_query_embedding(text):
+    """Embedding of `text` as a float32 array, served from the embedding cache when possible"""
+    return get_embedding_cache().get_or_compute(text, config.EMBEDDING_MODEL, request_openai_embedding)
+
+def generate_openai_embedding(text):
+    return get_query_embedding(text).tolist()
+
 # Function to fetch similar documents based on a query
 def find_similar_documents(query, top_n=3):
     # Generate the embedding for the query
-    query_embedding = generate_openai_embedding(query)
-    
-    result = []
-    with driver.session() as session:
-        # Fetch all documents' embeddings from Neo4j
-        result = session.run("""CALL db.index.vector.queryNodes('concept-embeddings', 3, $query_embedding)
-                            YIELD node, score
-                            RETURN node, score""",query_embedding=query_embedding)
+    if config.RETRIEVAL_BACKEND == "numpy":
+        results = get_concept_index().search(get_query_embedding(query), top_n)
+        return [(name, description) for name, description, score in results]
 
-        records = [(record['node']['concept_name'], record['node']['concept_description']) for record in result]
-        return records
+    return get_graph_store().similar_concepts(generate_openai_embedding(query), top_n)
 
 
 class Queries(BaseModel):
     questions: list[str] = Field(description="Questions to be asked to the student")
 
+@lru_cache(maxsize=None)
+def get_question_llm():
+    return get_chat_model().with_structured_output(Queries)
+
 def create_questions(foundation_concepts):
     prompt = QUERY_CREATOR_PROMPT.format(foundation_concepts=foundation_concepts)
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    structured_llm = model.with_structured_output(Queries)
-    response = structured_llm.invoke(prompt)
+    response = get_question_llm().invoke(prompt)
     return response.questions
 
 def create_personalized_narration(topic, profile):
     prompt = PERSONALIZED_NARRATOR_PROMPT.format(topic=topic, profile=profile)
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    response = model.invoke(prompt)
+    response = get_chat_model().invoke(prompt)
     return response.content
+
+def stream_personalized_narration(topic, profile):
+    """Same as create_personalized_narration, but yields the narration piece by piece"""
+    prompt = PERSONALIZED_NARRATOR_PROMPT.format(topic=topic, profile=profile)
+    for chunk in get_chat_model().stream(prompt):
+        if chunk.content:
+            yield chunk.content
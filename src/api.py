@@ -1,103 +1,81 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from neo4j import GraphDatabase
-from typing import List, Dict, Any
 import requests
 import traceback
-from agent import agent  # Add this import at the top
+import uuid
+import json
+from metrics import turn_summary
+from embedding_cache import get_embedding_cache
+from response_cache import get_response_cache
+from prerequisites import get_learning_path
+from personas import get_persona_registry
+from llm_scheduler import get_scheduler
+from llm_cassette import get_cassette
+from tracing import span_summary, prometheus_text
+from graph_store import get_graph_store
+from curriculum_cache import get_curriculum_cache
+from chat_history import get_chat_history
+import db
+import config
+from agent import run_turn, agent_stream, warm_up  # Add this import at the top
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Add this to store chat messages (in a real app, you'd use a database)
-chat_messages = []
-
-def get_neo4j_credentials():
-    """Read Neo4j credentials from config file"""
-    credentials = {}
-    with open('neo4j.txt', 'r') as f:
-        for line in f:
-            key, value = line.strip().split('=')
-            credentials[key] = value
-    return credentials
-
-def execute_neo4j_query(cypher_query: str, parameters: dict = None) -> List[Dict[str, Any]]:
+def curriculum_response(key: str, load):
     """
-    Execute a Cypher query on Neo4j database and return the results.
-    
-    Args:
-        cypher_query (str): The Cypher query to execute
-        parameters (dict, optional): Parameters for the query. Defaults to None.
-    
-    Returns:
-        List[Dict[str, Any]]: List of results where each result is a dictionary
+    Serve a curriculum payload from the versioned cache, or 304 when the client's ETag is current.
+
+    Returns None when `load()` finds nothing.
     """
-    # Database credentials
-    # URI = "neo4j+s://a83594c4.databases.neo4j.io"
-    # USERNAME = "neo4j"
-    # PASSWORD = "nXh9u6nEUPJKLVnyuzxe7NDgeCVJCYBoFX1NDJan9pw"
-    credentials = get_neo4j_credentials()
-    URI = credentials.get('NEO4J_URI')
-    USERNAME = credentials.get('NEO4J_USERNAME')
-    PASSWORD = credentials.get('NEO4J_PASSWORD')
-    
-    # Initialize the results list
-    results = []
-    
-    try:
-        # Create a driver instance
-        driver = GraphDatabase.driver(URI, auth=(USERNAME, PASSWORD))
-        
-        # Create a session
-        with driver.session() as session:
-            # Execute the query
-            result = session.run(cypher_query, parameters or {})
-            
-            # Convert results to a list of dictionaries
-            for record in result:
-                results.append(dict(record))
-                
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
-        raise
-        
-    finally:
-        # Close the driver
-        if 'driver' in locals():
-            driver.close()
-    
-    return results
+    cache = get_curriculum_cache()
+    etag = cache.etag(cache.current(), key)
+    if request.if_none_match.contains(etag):
+        cache.not_modified()
+        response = Response(status=304)
+    else:
+        body, found = cache.get(key, load)
+        if not found:
+            return None
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Browsers may keep the response but must revalidate it, which is a 304 until the pipeline runs again
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def load_chapters():
+    chapters = get_graph_store().chapters()
+    if not chapters:
+        print("No chapters found in database")  # Debug print
+    return chapters or []
+
+# (cache key, loader) of each curriculum payload, shared by the routes and the frontend's in-process client
+
+def chapters_query():
+    return 'chapters', load_chapters
+
+def chapter_query(chapter_name: str):
+    def load():
+        result = get_graph_store().chapter(chapter_name)
+        return {'result': result} if result is not None else None
+    return f'chapter:{chapter_name}', load
+
+def manifest_query(chapter_name: str):
+    def load():
+        manifest = get_graph_store().chapter_manifest(chapter_name)
+        return {'manifest': manifest} if manifest is not None else None
+    return f'manifest:{chapter_name}', load
+
+def topic_query(section_name: str):
+    def load():
+        section = get_graph_store().topic(section_name)
+        return {'section': section} if section is not None else None
+    return f'topic:{section_name}', load
 
 @app.route('/api/chapters', methods=['GET'])
 def get_chapters():
-    query = """
-    MATCH (c:CHAPTER)
-    OPTIONAL MATCH (c)-[:HAS_content]->(s:SECTION)
-    WITH c, collect(s) as sections
-    RETURN collect({
-        chapter_name: c.chapter_name,
-        chapter_no: c.chapter_no,
-        topics: [section IN sections | {
-            section_name: section.section_name,
-            title: section.section_name,
-            content: toString(section.page_no)
-        }]
-    }) as chapters
-    """
-    
     try:
-        results = execute_neo4j_query(query)
-        # print("Raw Neo4j results:", results)  # Debug print
-        
-        if results and len(results) > 0:
-            chapters = results[0].get('chapters', [])
-            # Filter out any null or empty chapters
-            chapters = [chapter for chapter in chapters if chapter.get('chapter_name')]
-            # print("Found chapters:", chapters)  # Debug print
-            return jsonify(chapters)
-        
-        print("No chapters found in database")  # Debug print
-        return jsonify([])
+        return curriculum_response(*chapters_query())
         
     except Exception as e:
         print(f"Error in get_chapters: {str(e)}")  # Debug print
@@ -106,34 +84,13 @@ def get_chapters():
 
 @app.route('/api/chapters/<chapter_name>', methods=['GET'])
 def get_chapter(chapter_name):
-    query = """
-    MATCH (c:CHAPTER {chapter_name: $chapter_name})
-    OPTIONAL MATCH (c)-[:HAS_content]->(s:SECTION)
-    WITH c, collect(s) as sections
-    RETURN {
-        chapter_name: c.chapter_name,
-        chapter_no: c.chapter_no,
-        topics: [section IN sections | {
-            section_name: section.section_name,
-            title: section.section_name,
-            content: section.section_content,
-            section_no: section.section_no
-        }]
-    } as result
-    """
-    
     try:
         # URL decode the chapter_name
         decoded_chapter_name = requests.utils.unquote(chapter_name)
         # print(f"Looking for chapter: {decoded_chapter_name}")  # Debug print
-        
-        results = execute_neo4j_query(query, {"chapter_name": decoded_chapter_name})
-        # print("Raw Neo4j results:", results)  # Debug print
-        
-        if results and len(results) > 0 and results[0] is not None:
-            result = results[0]
-            print("API Response:", result)  # Debug print
-            return jsonify(result)
+        response = curriculum_response(*chapter_query(decoded_chapter_name))
+        if response is not None:
+            return response
             
         print("No results found for chapter:", decoded_chapter_name)  # Debug print
         return jsonify({'error': 'Chapter not found', 'chapter_name': decoded_chapter_name}), 404
@@ -143,74 +100,184 @@ def get_chapter(chapter_name):
         traceback.print_exc()  # Print full stack trace
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chapters/<chapter_name>/manifest', methods=['GET'])
+def get_chapter_manifest(chapter_name):
+    """The chapter's topics in order with their sizes; fetch each topic's content from /api/topic"""
+    try:
+        decoded_chapter_name = requests.utils.unquote(chapter_name)
+        response = curriculum_response(*manifest_query(decoded_chapter_name))
+        if response is not None:
+            return response
+        return jsonify({'error': 'Chapter not found', 'chapter_name': decoded_chapter_name}), 404
+    except Exception as e:
+        print(f"Error in get_chapter_manifest: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/topic/<section_name>', methods=['GET'])
 def get_topic(section_name):
-    query = """
-    MATCH (s:SECTION {section_name: $section_name})
-    RETURN {
-        section_name: s.section_name,
-        title: s.section_name,
-        content: s.section_content,
-        section_no: s.section_no
-    } as section
-    """
-    
     try:
         # URL decode the section_name
         decoded_section_name = requests.utils.unquote(section_name)
         # print(f"Looking for section: {decoded_section_name}")  # Debug print
-        
-        results = execute_neo4j_query(query, {"section_name": decoded_section_name})
-        if results and len(results) > 0:
-            return jsonify(results[0])
+        response = curriculum_response(*topic_query(decoded_section_name))
+        if response is not None:
+            return response
         return jsonify({'error': 'Section not found'}), 404
     except Exception as e:
         print(f"Error in get_topic: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/learning-path/<concept_name>', methods=['GET'])
+def learning_path(concept_name):
+    """Prerequisites of a concept in study order, served from the in-memory prerequisite graph"""
+    try:
+        decoded_concept_name = requests.utils.unquote(concept_name)
+        path = get_learning_path(decoded_concept_name)
+        if path is None:
+            return jsonify({'error': 'Concept not found', 'concept_name': decoded_concept_name}), 404
+        return jsonify({'concept_name': path[-1]['concept_name'], 'path': path})
+    except Exception as e:
+        print(f"Error in learning_path: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/students', methods=['GET'])
+def get_students():
+    """Students that can be passed as `student_id` to the chat endpoints"""
+    return jsonify(get_persona_registry().list())
+
+def get_session_id(data: dict) -> str:
+    """Return the conversation thread for a chat request, starting a new one if none was sent"""
+    session_id = str(data.get('session_id') or '').strip()
+    if not session_id or len(session_id) > 128:
+        session_id = uuid.uuid4().hex
+    return session_id
+
+def chat_turn(message: str, context: dict, session_id: str, student_id: str = None) -> dict:
+    """Answer one chat message and record the turn in the session's history"""
+    turn = run_turn(message, context, session_id, student_id)
+    entry = get_chat_history().append(session_id, message, turn["response"])
+    return {"response": turn["response"], "session_id": session_id, "turn_id": entry["id"],
+            "metrics": turn["metrics"]}
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     data = request.json
     message = data.get('message', '')
     context = data.get('context', {})
+    session_id = get_session_id(data)
+    student_id = data.get('student_id')
     print("len of context is", len(context))
     try:
-        # Get response from AI agent
-        ai_response = agent(message, context)
-        # print("ai response is",ai_response)
-        # Store the conversation in chat history
-        chat_messages.append({"user": message, "ai": ai_response})
-        
-        return jsonify({"response": ai_response})
+        # Get response from AI agent, and store the conversation in chat history
+        return jsonify(chat_turn(message, context, session_id, student_id))
         
     except Exception as e:
         print(f"Error in chat: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /api/chat that emits progress and answer tokens as Server-Sent Events"""
+    data = request.json
+    message = data.get('message', '')
+    context = data.get('context', {})
+    session_id = get_session_id(data)
+    student_id = data.get('student_id')
+
+    def generate():
+        yield format_sse('session', {'session_id': session_id})
+        try:
+            for event, payload in agent_stream(message, context, session_id, student_id):
+                if event == 'done':
+                    entry = get_chat_history().append(session_id, message, payload['response'])
+                    payload = {**payload, 'session_id': session_id, 'turn_id': entry['id']}
+                yield format_sse(event, payload)
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            traceback.print_exc()
+            yield format_sse('error', {'error': str(e)})
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
 @app.route('/api/chat/history', methods=['GET'])
-def get_chat_history():
-    return jsonify(chat_messages)
+def chat_history():
+    """
+    Turns of one session after the `since` turn id (0 for all kept turns).
+
+    Returns {"turns": [{"id", "user", "ai", "created_at"}], "cursor": id to pass as `since` next time,
+    "truncated": whether some turns after `since` were already dropped}.
+    """
+    session_id = request.args.get('session_id', '')
+    if not session_id:
+        return jsonify({'error': 'session_id is required'}), 400
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'since must be a turn id'}), 400
+    return jsonify({'session_id': session_id, **get_chat_history().since(session_id, since)})
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Span latency histograms, token counts and LLM queue depth in the Prometheus text format"""
+    waiting = {('model', model): stats['waiting'] for model, stats in get_scheduler().stats().items()}
+    pool = db.pool_metrics()
+    text = prometheus_text({
+        'socratix_llm_queue_waiting': waiting,
+        'socratix_neo4j_sessions_in_use': {('pool', 'default'): pool['sessions_in_use']},
+    })
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics/spans', methods=['GET'])
+def get_span_metrics():
+    return jsonify(span_summary())
+
+@app.route('/api/metrics/neo4j', methods=['GET'])
+def get_neo4j_metrics():
+    return jsonify(db.pool_metrics())
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Liveness of the API and reachability of the knowledge graph"""
+    if config.GRAPH_STORE != "neo4j":
+        return jsonify({'ok': True, 'neo4j': None})
+    neo4j_health = db.health_check()
+    return jsonify({'ok': neo4j_health['ok'], 'neo4j': neo4j_health}), 200 if neo4j_health['ok'] else 503
+
+@app.route('/api/metrics/turns', methods=['GET'])
+def get_turn_metrics():
+    return jsonify(turn_summary())
+
+@app.route('/api/metrics/caches', methods=['GET'])
+def get_cache_metrics():
+    return jsonify({"embeddings": get_embedding_cache().stats(), "responses": get_response_cache().stats(),
+                    "curriculum": get_curriculum_cache().stats(), "chat_history": get_chat_history().stats(),
+                    "cassette": {"mode": get_cassette().mode, **get_cassette().stats}})
+
+@app.route('/api/metrics/llm', methods=['GET'])
+def get_llm_metrics():
+    """Queue depth, waits and rate limiting per model from the LLM scheduler"""
+    return jsonify(get_scheduler().stats())
 
 @app.route('/api/debug/chapters', methods=['GET'])
 def debug_chapters():
-    query = """
-    MATCH (c:CHAPTER)
-    RETURN collect({
-        chapter_name: c.chapter_name,
-        chapter_no: c.chapter_no
-    }) as chapters
-    """
-    
     try:
-        results = execute_neo4j_query(query)
-        # print("Debug - Raw chapter results:", results)
-        return jsonify(results[0] if results else {'error': 'No chapters found'})
+        chapters = get_graph_store().chapter_names()
+        # print("Debug - Raw chapter results:", chapters)
+        return jsonify({'chapters': chapters} if chapters else {'error': 'No chapters found'})
     except Exception as e:
         print(f"Debug - Error: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    warm_up()
     app.run(port=5000)
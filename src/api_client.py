@@ -0,0 +1,172 @@
+"""
+Data access for the Dash frontend: the curriculum and chat endpoints of the API.
+
+`HttpApiClient` talks to a separate API server over pooled keep-alive connections;
+`InProcessApiClient` calls the API's query functions in this process, for single-node deployments.
+"""
+import json
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+
+
+class ApiError(Exception):
+    """The API answered with an error status"""
+
+    def __init__(self, status: int, path: str):
+        super().__init__(f"{path} returned status {status}")
+        self.status = status
+
+
+class ApiClient(ABC):
+    """The calls the frontend makes; topics can be prefetched in the background"""
+
+    def __init__(self):
+        self.prefetcher = ThreadPoolExecutor(max_workers=2)
+
+    @abstractmethod
+    def chapters(self) -> list:
+        """All chapters"""
+
+    @abstractmethod
+    def chapter_manifest(self, chapter_name: str):
+        """The chapter's topics in order, without their content; None if there is no such chapter"""
+
+    @abstractmethod
+    def topic(self, section_name: str):
+        """A section with its content; None if there is no such section"""
+
+    @abstractmethod
+    def chat(self, message: str, context: dict, session_id: str = None) -> dict:
+        """One chat turn: {"response", "session_id", "turn_id", "metrics"}"""
+
+    def prefetch_topic(self, section_name: str):
+        """Load a topic in the background, so following the "next" link does not wait for its content"""
+        self.prefetcher.submit(self.topic, section_name)
+
+
+class HttpApiClient(ApiClient):
+    """
+    The API over HTTP, with one keep-alive connection pool for all Dash callbacks.
+
+    GETs are retried with backoff on connection errors and 502/503/504; chat POSTs are not,
+    as a retried turn would be answered (and billed) twice. Topic content is kept with its
+    ETag, so a revisit (or a prefetched neighbour) only costs a bodiless 304 revalidation.
+    """
+
+    def __init__(self, base_url: str, timeout: float, retries: int, pool_size: int):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        retry = Retry(total=retries, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset({'GET'}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.topic_cache = OrderedDict()  # section name -> (etag, section)
+        self.topic_cache_lock = threading.Lock()
+
+    def request(self, method: str, path: str, headers: dict = None, json: dict = None, timeout: float = None):
+        """(status, headers, decoded JSON body or None) of one API call"""
+        response = self.session.request(method, self.base_url + path, headers=headers, json=json,
+                                        timeout=(config.FRONTEND_CONNECT_TIMEOUT, timeout or self.timeout))
+        try:
+            data = response.json() if response.content else None
+        except ValueError:
+            data = None
+        return response.status_code, response.headers, data
+
+    def get(self, path: str, headers: dict = None):
+        status, response_headers, data = self.request('GET', path, headers=headers)
+        if status >= 400 and status != 404:
+            raise ApiError(status, path)
+        return status, response_headers, data
+
+    def chapters(self) -> list:
+        return self.get('/chapters')[2]
+
+    def chapter_manifest(self, chapter_name: str):
+        status, _, data = self.get(f'/chapters/{requests.utils.quote(chapter_name)}/manifest')
+        return data['manifest'] if status == 200 else None
+
+    def topic(self, section_name: str):
+        with self.topic_cache_lock:
+            cached = self.topic_cache.get(section_name)
+        headers = {'If-None-Match': cached[0]} if cached and cached[0] else {}
+        status, response_headers, data = self.get(f'/topic/{requests.utils.quote(section_name)}', headers=headers)
+        if status == 304 and cached:
+            section = cached[1]
+        elif status == 200:
+            section = data['section']
+        else:
+            return None
+        with self.topic_cache_lock:
+            self.topic_cache[section_name] = (response_headers.get('ETag'), section)
+            self.topic_cache.move_to_end(section_name)
+            while len(self.topic_cache) > config.TOPIC_CACHE_SIZE:
+                self.topic_cache.popitem(last=False)
+        return section
+
+    def chat(self, message: str, context: dict, session_id: str = None) -> dict:
+        payload = {'message': message, 'context': context, 'session_id': session_id}
+        status, _, data = self.request('POST', '/chat', json=payload, timeout=config.FRONTEND_CHAT_TIMEOUT)
+        if status != 200:
+            raise ApiError(status, '/chat')
+        return data
+
+
+class InProcessApiClient(ApiClient):
+    """
+    The API's query functions called in this process, with no HTTP request in between.
+
+    Curriculum payloads come from the API's versioned curriculum cache, shared with the API
+    routes served by this process; decoding a cached body is the only per-call cost.
+    """
+
+    def __init__(self):
+        super().__init__()
+        import api
+
+        self.api = api
+
+    def cached(self, key: str, load):
+        body, found = self.api.get_curriculum_cache().get(key, load)
+        return json.loads(body) if found else None
+
+    def chapters(self) -> list:
+        return self.cached(*self.api.chapters_query())
+
+    def chapter_manifest(self, chapter_name: str):
+        data = self.cached(*self.api.manifest_query(chapter_name))
+        return data['manifest'] if data else None
+
+    def topic(self, section_name: str):
+        data = self.cached(*self.api.topic_query(section_name))
+        return data['section'] if data else None
+
+    def chat(self, message: str, context: dict, session_id: str = None) -> dict:
+        try:
+            return self.api.chat_turn(message, context, self.api.get_session_id({'session_id': session_id}))
+        except Exception as e:
+            print(f"Error in chat: {str(e)}")
+            traceback.print_exc()
+            raise ApiError(500, '/chat') from e
+
+
+@lru_cache(maxsize=None)
+def get_api_client() -> ApiClient:
+    """Return the frontend's API client, selected by SOCRATIX_FRONTEND_API_MODE ("http" or "inprocess")"""
+    if config.FRONTEND_API_MODE == 'inprocess':
+        return InProcessApiClient()
+    return HttpApiClient(config.API_BASE_URL, config.FRONTEND_API_TIMEOUT, config.FRONTEND_API_RETRIES,
+                         config.FRONTEND_API_POOL_SIZE)
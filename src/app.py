@@ -1,9 +1,11 @@
 import dash
-from dash import html, dcc
+from dash import html, dcc, Patch
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import requests
 import traceback
+from api_client import ApiError, get_api_client
+import config
 
 # Initialize the Dash app
 app = dash.Dash(
@@ -12,8 +14,20 @@ app = dash.Dash(
     suppress_callback_exceptions=True
 )
 
-# API base URL
-API_BASE_URL = 'http://localhost:5000/api'
+# API base URL, as seen from the browser (the chat stream is fetched from there)
+API_BASE_URL = '/api' if config.FRONTEND_API_MODE == 'inprocess' else config.API_BASE_URL
+
+if config.FRONTEND_API_MODE == 'inprocess':
+    # Serve the API from the Dash server too, so a single process handles everything
+    import api
+    dash_wsgi_app = app.server.wsgi_app
+
+    def route_api(environ, start_response):
+        if environ.get('PATH_INFO', '').startswith('/api/'):
+            return api.app.wsgi_app(environ, start_response)
+        return dash_wsgi_app(environ, start_response)
+
+    app.server.wsgi_app = route_api
 
 # Create flashcard function now fetches data from API
 def create_flashcard(chapter_card):
@@ -87,12 +101,20 @@ main_layout = html.Div([
 # Add a dcc store to hold chat context
 context = dcc.Store(id='context', data={})
 chapter_store = dcc.Store(id='chapter-store', data={})
+# Conversation thread for this browser tab, assigned by the API on the first message
+session_store = dcc.Store(id='session-id', storage_type='session')
+api_base_url_store = dcc.Store(id='api-base-url', data=API_BASE_URL)
+# The chat turn being streamed: {"id", "user", "answer", "status", "done"}
+chat_turn_store = dcc.Store(id='chat-turn')
 
 # Update app.layout to include both main and topic layouts
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
     context,
     chapter_store,
+    session_store,
+    api_base_url_store,
+    chat_turn_store,
     # Main layout
     html.Div(main_layout, id='main-content'),
     # Topic layout - initially hidden
@@ -141,6 +163,42 @@ app.layout = html.Div([
                 
                 # Center content
                 dbc.Col([
+                    # Previous / next links and the topic title, set in the browser (assets/navigation.js)
+                    dbc.Row([
+                        dbc.Col(
+                            dcc.Link(
+                                html.I(className="fas fa-chevron-left fa-2x"),
+                                id="prev-topic-link",
+                                href="#",
+                                style={'color': '#ccc', 'pointerEvents': 'none'}
+                            ),
+                            width=1,
+                            style={'textAlign': 'center', 'alignSelf': 'center'}
+                        ),
+                        dbc.Col(
+                            html.H2(
+                                id="topic-title",
+                                className="mb-4",
+                                style={
+                                    'color': 'white',
+                                    'fontFamily': "'Bebas Neue', sans-serif",
+                                    'letterSpacing': '2px'
+                                }
+                            ),
+                            width=10,
+                            style={'textAlign': 'center'}
+                        ),
+                        dbc.Col(
+                            dcc.Link(
+                                html.I(className="fas fa-chevron-right fa-2x"),
+                                id="next-topic-link",
+                                href="#",
+                                style={'color': '#ccc', 'pointerEvents': 'none'}
+                            ),
+                            width=1,
+                            style={'textAlign': 'center', 'alignSelf': 'center'}
+                        ),
+                    ], className="mb-4", align="center"),
                     html.Div(id="topic-content", className="topic-content")
                 ], width=6),
                 
@@ -162,6 +220,8 @@ app.layout = html.Div([
                                    'marginBottom': '20px'
                                }),
                         html.Div(
+                            # Finished turns, and the turn being streamed
+                            [html.Div([], id="chat-history"), html.Div([], id="chat-live")],
                             id="chat-messages",
                             className="chat-messages",
                             style={
@@ -195,18 +255,13 @@ app.layout = html.Div([
     ], id='topic-layout', style={'display': 'none'})
 ])
 
-# Update the display_page callback to show/hide layouts
-@app.callback(
+# Show/hide layouts, in the browser (assets/navigation.js)
+app.clientside_callback(
+    ClientsideFunction(namespace='navigation', function_name='toggle_layouts'),
     [Output('main-content', 'style'),
      Output('topic-layout', 'style')],
     [Input('url', 'pathname')]
 )
-def toggle_layouts(pathname):
-    if pathname == '/':
-        return {'display': 'block'}, {'display': 'none'}
-    elif pathname.startswith('/subject/'):
-        return {'display': 'none'}, {'display': 'block'}
-    return {'display': 'none'}, {'display': 'none'}
 
 # Add a new callback to populate the cards
 @app.callback(
@@ -216,21 +271,19 @@ def toggle_layouts(pathname):
 def update_cards(pathname):
     if pathname == '/':
         try:
-            response = requests.get(f'{API_BASE_URL}/chapters')
-            if response.status_code == 200:
-                chapters = response.json()
-                #print("Received chapters:", chapters)  # Debug print
-                
-                # Create flashcards from the chapters
-                flashcards = []
-                for chapter in chapters:
-                    if isinstance(chapter, dict):
-                        flashcards.append(create_flashcard(chapter))
-                
-                return flashcards
-            else:
-                print(f"API Error: Status {response.status_code}")
-                return [html.Div(f"Error: Could not fetch chapters (Status: {response.status_code})")]
+            chapters = get_api_client().chapters()
+            #print("Received chapters:", chapters)  # Debug print
+            
+            # Create flashcards from the chapters
+            flashcards = []
+            for chapter in chapters:
+                if isinstance(chapter, dict):
+                    flashcards.append(create_flashcard(chapter))
+            
+            return flashcards
+        except ApiError as e:
+            print(f"API Error: Status {e.status}")
+            return [html.Div(f"Error: Could not fetch chapters (Status: {e.status})")]
         except Exception as e:
             print(f"Error in update_cards: {str(e)}")
             return [html.Div(f"An unexpected error occurred: {str(e)}")]
@@ -369,10 +422,10 @@ def load_chapter_data(pathname):
     
     try:
         chapter_name = requests.utils.unquote(pathname.split('/')[2])
-        response = requests.get(f'{API_BASE_URL}/chapters/{chapter_name}')
-        data = response.json()['result']
+        # Only the manifest (topic names, order and sizes) goes into the store; content is loaded per topic
+        data = get_api_client().chapter_manifest(chapter_name)
         
-        if data and 'error' not in data:
+        if data:
             data['chapter_name'] = chapter_name  # Store chapter name in data
             return data, chapter_name
             
@@ -382,35 +435,25 @@ def load_chapter_data(pathname):
     
     return {}, f"Error: {chapter_name}"
 
-# Update the callback to create navigation links
-@app.callback(
+# Topic links with the current one active, and the previous / next links, built in the browser
+# from the chapter manifest (assets/navigation.js)
+app.clientside_callback(
+    ClientsideFunction(namespace='navigation', function_name='topics_nav'),
     Output('topics-nav', 'children'),
     [Input('chapter-store', 'data'),
-     Input('url', 'pathname')]  # Add pathname as an input
+     Input('url', 'pathname')]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='navigation', function_name='topic_header'),
+    [Output('prev-topic-link', 'href'),
+     Output('prev-topic-link', 'style'),
+     Output('topic-title', 'children'),
+     Output('next-topic-link', 'href'),
+     Output('next-topic-link', 'style')],
+    [Input('url', 'pathname'),
+     Input('chapter-store', 'data')]
 )
-def update_topics_nav(chapter_data, pathname):
-    if not chapter_data:
-        return []
-    
-    chapter_name = chapter_data.get('chapter_name', '')
-    current_topic = None
-    
-    # Extract current topic from pathname if it exists
-    if pathname and len(pathname.split('/')) >= 5:
-        current_topic = requests.utils.unquote(pathname.split('/')[4])
-    
-    nav_links = [
-        dbc.NavLink(
-            topic['title'],
-            href=f"/subject/{requests.utils.quote(chapter_name)}/topic/{requests.utils.quote(topic['section_name'])}",
-            id=f"topic-link-{topic['section_name']}",
-            active=(topic['section_name'] == current_topic),  # Set active based on current topic
-            style={
-                'fontFamily': "'Ubuntu', sans-serif"
-            }
-        ) for topic in chapter_data.get('topics', [])
-    ]
-    return nav_links
 
 # Add callback to update topic content
 @app.callback(
@@ -428,50 +471,36 @@ def update_topic_content(pathname, chapter_data):
         chapter_name = chapter_data.get('chapter_name', '')
         topics = chapter_data.get('topics', [])
         
-        # Default to first topic if no specific topic is selected
-        if len(parts) < 5 and topics:
-            current_topic = topics[0]
-            prev_topic = None
-            next_topic = topics[1] if len(topics) > 1 else None
-            
-            topic_content = create_topic_content(chapter_name, current_topic, prev_topic, next_topic)
-            return topic_content, {'chapter': chapter_name, 'topic': current_topic.get('content')}
-        
-        # Handle specific topic selection
+        # Handle specific topic selection, defaulting to the first topic
         if len(parts) >= 5:
             section_name = requests.utils.unquote(parts[4])
             
             # Find the current topic
             current_topic = next(
                 (t for t in topics if t['section_name'] == section_name),
-                topics[0] if topics else {'title': 'No topics available', 'content': ''}
+                topics[0] if topics else None
             )
-        elif topics:
-            current_topic = topics[0]
         else:
-            current_topic = {'title': 'No topics available', 'content': ''}
+            current_topic = topics[0] if topics else None
         
-        # Find current topic index
-        current_index = next(
-            (i for i, t in enumerate(topics) if t['section_name'] == current_topic['section_name']),
-            0
-        )
-        
-        prev_topic = topics[current_index - 1] if current_index > 0 else None
-        next_topic = topics[current_index + 1] if current_index < len(topics) - 1 else None
+        if current_topic is None:
+            return create_topic_content(''), {}
         
-        topic_content = create_topic_content(chapter_name, current_topic, prev_topic, next_topic)
+        section = get_api_client().topic(current_topic['section_name'])
+        content = (section or {}).get('content')
+        # The manifest is in section order, so the next topic is the one after the current one
+        next_index = topics.index(current_topic) + 1
+        if next_index < len(topics):
+            get_api_client().prefetch_topic(topics[next_index]['section_name'])
         
-        return topic_content, {'chapter': chapter_name, 'topic': current_topic.get('content')}
+        return create_topic_content(content or 'No content available'), {'chapter': chapter_name, 'topic': content or ''}
         
     except Exception as e:
         print(f"Error updating topic content: {str(e)}")
         traceback.print_exc()
         return f"Error loading content: {str(e)}", {}
 
-def create_topic_content(chapter_name, current_topic, prev_topic, next_topic):
-    content = current_topic.get('content', 'No content available')
-    
+def create_topic_content(content):
     # Ensure headers have proper spacing
     formatted_content = content.replace('###', '### ')
     
@@ -512,45 +541,6 @@ def create_topic_content(chapter_name, current_topic, prev_topic, next_topic):
     formatted_content = '\n'.join(processed_lines)
 
     return html.Div([
-        dbc.Row([
-            dbc.Col(
-                dcc.Link(
-                    html.I(className="fas fa-chevron-left fa-2x"),
-                    href=f"/subject/{chapter_name}/topic/{prev_topic['section_name']}" if prev_topic else "#",
-                    style={
-                        'color': '#4c1d95' if prev_topic else '#ccc',
-                        'pointerEvents': 'auto' if prev_topic else 'none'
-                    }
-                ),
-                width=1,
-                style={'textAlign': 'center', 'alignSelf': 'center'}
-            ),
-            dbc.Col(
-                html.H2(
-                    current_topic.get('title', 'No Title'),
-                    className="mb-4",
-                    style={
-                        'color': 'white',
-                        'fontFamily': "'Bebas Neue', sans-serif",
-                        'letterSpacing': '2px'
-                    }
-                ),
-                width=10,
-                style={'textAlign': 'center'}
-            ),
-            dbc.Col(
-                dcc.Link(
-                    html.I(className="fas fa-chevron-right fa-2x"),
-                    href=f"/subject/{chapter_name}/topic/{next_topic['section_name']}" if next_topic else "#",
-                    style={
-                        'color': '#4c1d95' if next_topic else '#ccc',
-                        'pointerEvents': 'auto' if next_topic else 'none'
-                    }
-                ),
-                width=1,
-                style={'textAlign': 'center', 'alignSelf': 'center'}
-            ),
-        ], className="mb-4", align="center"),
         html.Div(
             dcc.Markdown(
                 formatted_content,
@@ -577,71 +567,86 @@ def create_topic_content(chapter_name, current_topic, prev_topic, next_topic):
         )
     ])
 
+def chat_bubbles(user_message, ai_message):
+    """The user's message and the AI Teacher's answer, as shown in the chat panel"""
+    return [
+        html.Div(
+            user_message,
+            className='user-message',
+            style={
+                'textAlign': 'right',
+                'margin': '10px',
+                'padding': '10px',
+                'backgroundColor': '#601B83',
+                'color': 'white',
+                'borderRadius': '10px',
+                'maxWidth': '80%',
+                'marginLeft': 'auto',
+                'fontSize': '0.9rem',
+                'marginBottom': '5px'  # Space between user and AI message
+            }
+        ),
+        html.Div(
+            dcc.Markdown(ai_message),
+            className='ai-message',
+            style={
+                'textAlign': 'left',
+                'margin': '10px',
+                'padding': '10px',
+                'backgroundColor': '#4c1d95',
+                'color': 'white',
+                'borderRadius': '10px',
+                'maxWidth': '80%',
+                'fontSize': '0.9rem',
+                'marginBottom': '20px'  # Increased space after AI message
+            }
+        )
+    ]
+
 # Add these callbacks for chat functionality
-@app.callback(
-    [Output('chat-messages', 'children'),
-     Output('chat-input', 'value')],
-    [Input('send-button', 'n_clicks')],
-    [State('chat-input', 'value'), State('context', 'data')]
-)
-def update_chat(n_clicks, message, data):
+def update_chat(n_clicks, message, data, session_id):
     if n_clicks is None or not message:
-        return [], ''
+        return dash.no_update, '', dash.no_update
 
     try:
         # Send message to API
-        response = requests.post(f'{API_BASE_URL}/chat', 
-                               json={'message': message, 'context': data})
-        
-        if response.status_code == 200:
-            # Get updated chat history
-            history_response = requests.get(f'{API_BASE_URL}/chat/history')
-            if history_response.status_code == 200:
-                chat_history = history_response.json()
-                
-                # Create message elements
-                messages = []
-                for chat in chat_history:
-                    messages.extend([
-                        html.Div(
-                            chat['user'],
-                            className='user-message',
-                            style={
-                                'textAlign': 'right',
-                                'margin': '10px',
-                                'padding': '10px',
-                                'backgroundColor': '#601B83',
-                                'color': 'white',
-                                'borderRadius': '10px',
-                                'maxWidth': '80%',
-                                'marginLeft': 'auto',
-                                'fontSize': '0.9rem',
-                                'marginBottom': '5px'  # Space between user and AI message
-                            }
-                        ),
-                        html.Div(
-                            dcc.Markdown(chat['ai']),
-                            className='ai-message',
-                            style={
-                                'textAlign': 'left',
-                                'margin': '10px',
-                                'padding': '10px',
-                                'backgroundColor': '#4c1d95',
-                                'color': 'white',
-                                'borderRadius': '10px',
-                                'maxWidth': '80%',
-                                'fontSize': '0.9rem',
-                                'marginBottom': '20px'  # Increased space after AI message
-                            }
-                        )
-                    ])
-                
-                return messages, ''
+        result = get_api_client().chat(message, data, session_id)
+        # Append only the new turn; the messages already in the browser are not sent again
+        messages = Patch()
+        messages.extend(chat_bubbles(message, result['response']))
+        return messages, '', result.get('session_id', session_id)
     
-    except requests.RequestException as e:
+    except (ApiError, requests.RequestException) as e:
         print(f"Chat API Error: {e}")
     
-    return [], message
+    return dash.no_update, message, dash.no_update
+
+if config.CHAT_STREAMING:
+    # Answers are streamed from /api/chat/stream into chat-turn, and rendered from there (assets/chat_stream.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='chat', function_name='stream_message'),
+        [Output('chat-input', 'value'),
+         Output('session-id', 'data'),
+         Output('chat-turn', 'data')],
+        [Input('send-button', 'n_clicks')],
+        [State('chat-input', 'value'), State('context', 'data'), State('session-id', 'data'),
+         State('api-base-url', 'data')]
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='chat', function_name='render_turn'),
+        [Output('chat-history', 'children'),
+         Output('chat-live', 'children')],
+        [Input('chat-turn', 'data')],
+        [State('chat-history', 'children')]
+    )
+else:
+    app.callback(
+        [Output('chat-history', 'children'),
+         Output('chat-input', 'value'),
+         Output('session-id', 'data')],
+        [Input('send-button', 'n_clicks')],
+        [State('chat-input', 'value'), State('context', 'data'), State('session-id', 'data')]
+    )(update_chat)
 
 # Add these styles to your app.index_string
 '''
@@ -701,4 +706,6 @@ def update_chat(n_clicks, message, data):
 '''
 
 if __name__ == '__main__':
+    if config.FRONTEND_API_MODE == 'inprocess':
+        api.warm_up()
     app.run_server(debug=True, port=8050)
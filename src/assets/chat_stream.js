@@ -0,0 +1,163 @@
+// Streams AI Teacher answers from /api/chat/stream into the chat panel as they arrive.
+// The turn in progress is kept in the chat-turn store and rendered by Dash (render_turn),
+// so the chat panel's children are only ever changed through Dash.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    chat: {
+        stream_message: function (n_clicks, message, context, sessionId, apiBaseUrl) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!n_clicks || !message) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+            sessionId = sessionId || newSessionId();
+
+            const turn = {id: n_clicks, user: message, answer: '', status: 'Thinking...', done: false};
+            let pending = false;
+            // Coalesce token updates to one render per frame
+            function update(changes) {
+                Object.assign(turn, changes);
+                if (pending) {
+                    return;
+                }
+                pending = true;
+                window.requestAnimationFrame(function () {
+                    pending = false;
+                    window.dash_clientside.set_props('chat-turn', {data: Object.assign({}, turn)});
+                });
+            }
+
+            const handlers = {
+                status: function (data) {
+                    update({status: data.stage === 'personalizing' ? 'Personalizing...' : 'Thinking...'});
+                },
+                tool: function (data) {
+                    update({status: data.status === 'start' ? `Using ${data.name}...` : `${data.name} finished`});
+                },
+                token: function (data) {
+                    update({status: null, answer: turn.answer + data.text});
+                },
+                done: function (data) {
+                    update({status: null, answer: data.response, done: true});
+                },
+                error: function (data) {
+                    update({status: `Error: ${data.error}`});
+                }
+            };
+
+            fetch(`${apiBaseUrl}/chat/stream`, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({message: message, context: context, session_id: sessionId})
+            })
+                .then(function (response) { return readEvents(response.body, handlers); })
+                .catch(function (err) { handlers.error({error: err.message}); });
+
+            return ['', sessionId, Object.assign({}, turn)];
+        },
+
+        // [chat-history children, chat-live children] for the turn in chat-turn
+        render_turn: function (turn, history) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!turn) {
+                return [noUpdate, noUpdate];
+            }
+            window.requestAnimationFrame(scrollToBottom);
+            if (turn.done) {
+                return [(history || []).concat(chatBubbles(turn.user, turn.answer)), []];
+            }
+            return [noUpdate, chatBubbles(turn.user, turn.answer, turn.status)];
+        }
+    }
+});
+
+function newSessionId() {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID().replace(/-/g, '');
+    }
+    return Date.now().toString(16) + Math.random().toString(16).slice(2);
+}
+
+function scrollToBottom() {
+    const container = document.getElementById('chat-messages');
+    if (container) {
+        container.scrollTop = container.scrollHeight;
+    }
+}
+
+// The user's message and the answer so far, like chat_bubbles in app.py
+function chatBubbles(userMessage, aiMessage, status) {
+    const answer = [];
+    if (status) {
+        answer.push(component('dash_html_components', 'Div', {
+            children: status,
+            style: {opacity: 0.7, fontStyle: 'italic'}
+        }));
+    }
+    if (aiMessage) {
+        answer.push(component('dash_core_components', 'Markdown', {children: aiMessage}));
+    }
+    return [
+        component('dash_html_components', 'Div', {
+            children: userMessage,
+            className: 'user-message',
+            style: bubbleStyle(true)
+        }),
+        component('dash_html_components', 'Div', {
+            children: answer,
+            className: 'ai-message',
+            style: bubbleStyle(false)
+        })
+    ];
+}
+
+function component(namespace, type, props) {
+    return {namespace: namespace, type: type, props: props};
+}
+
+function bubbleStyle(user) {
+    const style = {
+        textAlign: user ? 'right' : 'left',
+        margin: '10px',
+        padding: '10px',
+        backgroundColor: user ? '#601B83' : '#4c1d95',
+        color: 'white',
+        borderRadius: '10px',
+        maxWidth: '80%',
+        fontSize: '0.9rem',
+        marginBottom: user ? '5px' : '20px'
+    };
+    if (user) {
+        style.marginLeft = 'auto';
+    }
+    return style;
+}
+
+// Parse a text/event-stream body and dispatch each event to its handler.
+async function readEvents(body, handlers) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const {value, done} = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, {stream: true});
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(function (line) {
+                if (line.startsWith('event: ')) {
+                    event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            });
+            if (handlers[event] && data) {
+                handlers[event](JSON.parse(data));
+            }
+        }
+    }
+}
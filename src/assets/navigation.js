@@ -0,0 +1,69 @@
+// Navigation that only depends on the URL and the chapter manifest in chapter-store, computed
+// in the browser so following a link costs no server round trip.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    navigation: {
+        toggle_layouts: function (pathname) {
+            if (pathname === '/') {
+                return [{display: 'block'}, {display: 'none'}];
+            }
+            if (pathname && pathname.startsWith('/subject/')) {
+                return [{display: 'none'}, {display: 'block'}];
+            }
+            return [{display: 'none'}, {display: 'none'}];
+        },
+
+        topics_nav: function (chapterData, pathname) {
+            if (!chapterData || !chapterData.topics) {
+                return [];
+            }
+            const current = selectedTopic(pathname);
+            return chapterData.topics.map(function (topic) {
+                return {
+                    namespace: 'dash_bootstrap_components',
+                    type: 'NavLink',
+                    props: {
+                        children: topic.title,
+                        href: topicHref(chapterData.chapter_name, topic),
+                        active: topic.section_name === current,
+                        style: {fontFamily: "'Ubuntu', sans-serif"}
+                    }
+                };
+            });
+        },
+
+        topic_header: function (pathname, chapterData) {
+            const topics = (chapterData && chapterData.topics) || [];
+            if (!topics.length) {
+                const title = chapterData && chapterData.chapter_name ? 'No topics available' : '';
+                return ['#', arrowStyle(false), title, '#', arrowStyle(false)];
+            }
+            // Unknown or missing topics fall back to the first one, like the content callback
+            const index = Math.max(0, topics.findIndex(function (topic) {
+                return topic.section_name === selectedTopic(pathname);
+            }));
+            const prev = topics[index - 1];
+            const next = topics[index + 1];
+            return [
+                prev ? topicHref(chapterData.chapter_name, prev) : '#',
+                arrowStyle(Boolean(prev)),
+                topics[index].title,
+                next ? topicHref(chapterData.chapter_name, next) : '#',
+                arrowStyle(Boolean(next))
+            ];
+        }
+    }
+});
+
+// The section name in /subject/<chapter>/topic/<section>, or null
+function selectedTopic(pathname) {
+    const parts = (pathname || '').split('/');
+    return parts.length >= 5 ? decodeURIComponent(parts[4]) : null;
+}
+
+function topicHref(chapterName, topic) {
+    return `/subject/${encodeURIComponent(chapterName)}/topic/${encodeURIComponent(topic.section_name)}`;
+}
+
+function arrowStyle(enabled) {
+    return {color: enabled ? '#4c1d95' : '#ccc', pointerEvents: enabled ? 'auto' : 'none'};
+}
@@ -0,0 +1,36 @@
+"""A value loaded on first use and reloaded in the calling thread once it gets old."""
+import threading
+import time
+
+
+class CachedLoader:
+    """
+    Holds the result of `load()` and reloads it when it is older than `max_age` seconds.
+
+    Only one thread reloads at a time; the others keep getting the previous value meanwhile.
+    """
+
+    def __init__(self, load, max_age: float):
+        self.load = load
+        self.max_age = max_age
+        self.value = None
+        self.loaded_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.value is not None and time.time() - self.loaded_at <= self.max_age:
+            return self.value
+        if not self.lock.acquire(blocking=self.value is None):
+            return self.value
+        try:
+            if self.value is None or time.time() - self.loaded_at > self.max_age:
+                self.value = self.load()
+                self.loaded_at = time.time()
+        finally:
+            self.lock.release()
+        return self.value
+
+    def set(self, value):
+        """Replace the value, eg. with one built elsewhere"""
+        self.value = value
+        self.loaded_at = time.time()
@@ -0,0 +1,176 @@
+"""Recent chat turns per session, kept in bounded buffers (in memory or SQLite) and read incrementally."""
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+import config
+import state_store
+
+
+class SessionHistory:
+    """The last `max_turns` turns of one session; turn ids count up from 1 and are never reused"""
+
+    def __init__(self, max_turns: int):
+        self.turns = deque(maxlen=max_turns)
+        self.last_id = 0
+
+    def append(self, user: str, ai: str) -> dict:
+        self.last_id += 1
+        turn = {"id": self.last_id, "user": user, "ai": ai, "created_at": time.time()}
+        self.turns.append(turn)
+        return turn
+
+    def since(self, turn_id: int) -> list:
+        new_turns = self.last_id - turn_id
+        if new_turns <= 0:
+            return []
+        # Ids in the buffer are consecutive, so the new turns are its tail
+        return list(self.turns)[-new_turns:]
+
+
+class ChatHistoryStore:
+    """
+    Chat turns per session, for the chat panel.
+
+    Each session keeps its last `max_turns` turns and at most `max_sessions` sessions are kept,
+    dropping the least recently active one, so memory stays bounded however many students chat.
+    """
+
+    def __init__(self, max_turns: int, max_sessions: int):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()  # session id -> SessionHistory, least recently active first
+        self.lock = threading.Lock()
+
+    def append(self, session_id: str, user: str, ai: str) -> dict:
+        """Record one turn and return it with its id"""
+        with self.lock:
+            history = self.sessions.get(session_id)
+            if history is None:
+                history = self.sessions[session_id] = SessionHistory(self.max_turns)
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            self.sessions.move_to_end(session_id)
+            return history.append(user, ai)
+
+    def since(self, session_id: str, turn_id: int = 0) -> dict:
+        """
+        Turns of a session after `turn_id`, and the cursor to pass next time.
+
+        `truncated` is set when turns after `turn_id` have already been dropped from the buffer.
+        """
+        with self.lock:
+            history = self.sessions.get(session_id)
+            if history is None:
+                return {"turns": [], "cursor": turn_id, "truncated": False}
+            turns = history.since(turn_id)
+            truncated = bool(turns) and turns[0]["id"] > turn_id + 1
+            return {"turns": turns, "cursor": history.last_id, "truncated": truncated}
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"sessions": len(self.sessions), "turns": sum(len(h.turns) for h in self.sessions.values())}
+
+
+class SqliteChatHistoryStore:
+    """
+    `ChatHistoryStore` kept in SQLite, shared by every worker process using the same file.
+
+    Each append trims its session to the last `max_turns` turns; every `prune_interval` seconds
+    the least recently active sessions above `max_sessions` are dropped.
+    """
+
+    def __init__(self, conn, max_turns: int, max_sessions: int, prune_interval: float = 60.0):
+        self.conn = conn
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.prune_interval = prune_interval
+        self.last_prune = 0.0
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL,
+                    last_seen REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS chat_sessions_last_seen ON chat_sessions (last_seen);
+                CREATE TABLE IF NOT EXISTS chat_turns (
+                    session_id TEXT NOT NULL,
+                    turn_id INTEGER NOT NULL,
+                    user TEXT NOT NULL,
+                    ai TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, turn_id)
+                );
+                """
+            )
+
+    def append(self, session_id: str, user: str, ai: str) -> dict:
+        now = time.time()
+        with self.lock, self.conn:
+            # The upsert takes the database's write lock, so no other worker can take the same id
+            self.conn.execute(
+                """
+                INSERT INTO chat_sessions (session_id, last_id, last_seen) VALUES (?, 1, ?)
+                ON CONFLICT (session_id) DO UPDATE SET last_id = last_id + 1, last_seen = excluded.last_seen
+                """,
+                (session_id, now),
+            )
+            (turn_id,) = self.conn.execute(
+                "SELECT last_id FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            self.conn.execute(
+                "INSERT INTO chat_turns (session_id, turn_id, user, ai, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, turn_id, user, ai, now),
+            )
+            self.conn.execute(
+                "DELETE FROM chat_turns WHERE session_id = ? AND turn_id <= ?", (session_id, turn_id - self.max_turns))
+        if now - self.last_prune > self.prune_interval:
+            self.prune()
+        return {"id": turn_id, "user": user, "ai": ai, "created_at": now}
+
+    def since(self, session_id: str, turn_id: int = 0) -> dict:
+        with self.lock:
+            row = self.conn.execute("SELECT last_id FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return {"turns": [], "cursor": turn_id, "truncated": False}
+            rows = self.conn.execute(
+                """
+                SELECT turn_id, user, ai, created_at FROM chat_turns
+                WHERE session_id = ? AND turn_id > ? ORDER BY turn_id
+                """,
+                (session_id, turn_id),
+            ).fetchall()
+        turns = [{"id": r[0], "user": r[1], "ai": r[2], "created_at": r[3]} for r in rows]
+        truncated = bool(turns) and turns[0]["id"] > turn_id + 1
+        return {"turns": turns, "cursor": row[0], "truncated": truncated}
+
+    def prune(self):
+        """Drop the least recently active sessions above `max_sessions`"""
+        self.last_prune = time.time()
+        with self.lock, self.conn:
+            evicted = [row[0] for row in self.conn.execute(
+                "SELECT session_id FROM chat_sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?",
+                (self.max_sessions,),
+            ).fetchall()]
+            rows = [(session_id,) for session_id in evicted]
+            self.conn.executemany("DELETE FROM chat_turns WHERE session_id = ?", rows)
+            self.conn.executemany("DELETE FROM chat_sessions WHERE session_id = ?", rows)
+        return len(evicted)
+
+    def stats(self) -> dict:
+        with self.lock:
+            (sessions,) = self.conn.execute("SELECT count(*) FROM chat_sessions").fetchone()
+            (turns,) = self.conn.execute("SELECT count(*) FROM chat_turns").fetchone()
+        return {"sessions": sessions, "turns": turns}
+
+
+@lru_cache(maxsize=None)
+def get_chat_history():
+    """Return the chat history store selected by SOCRATIX_STATE_STORE ("sqlite" or "memory")"""
+    if state_store.is_shared():
+        return SqliteChatHistoryStore(state_store.connect(), config.CHAT_HISTORY_MAX_TURNS,
+                                      config.CHAT_HISTORY_MAX_SESSIONS)
+    return ChatHistoryStore(config.CHAT_HISTORY_MAX_TURNS, config.CHAT_HISTORY_MAX_SESSIONS)
@@ -0,0 +1,114 @@
+"""Durable, bounded LangGraph checkpointer backed by a local SQLite file."""
+import time
+from functools import lru_cache
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+import config
+import state_store
+
+
+class BoundedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver that keeps the on-disk conversation store bounded.
+
+    Only the latest `keep_per_thread` checkpoints of each thread are kept, threads idle
+    for longer than `ttl` seconds are dropped, and when more than `max_threads` threads
+    exist the least recently used ones are evicted.
+    """
+
+    def __init__(self, conn, ttl, max_threads, keep_per_thread=2, prune_interval=60.0):
+        super().__init__(conn)
+        self.ttl = ttl
+        self.max_threads = max_threads
+        self.keep_per_thread = max(1, keep_per_thread)
+        self.prune_interval = prune_interval
+        self.last_prune = 0.0
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS thread_activity_last_seen ON thread_activity (last_seen);
+            """
+        )
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(saved_config["configurable"]["thread_id"])
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_seen) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            self._trim_thread(cur, thread_id)
+        if time.time() - self.last_prune > self.prune_interval:
+            self.prune()
+        return saved_config
+
+    def _trim_thread(self, cur, thread_id):
+        """Drop all but the newest checkpoints (and their writes) of one thread"""
+        cur.execute(
+            """
+            SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+            ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?
+            """,
+            (thread_id, self.keep_per_thread),
+        )
+        stale = [(thread_id, row[0]) for row in cur.fetchall()]
+        if stale:
+            cur.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id = ?", stale)
+            cur.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id = ?", stale)
+
+    def _delete_threads(self, cur, thread_ids):
+        rows = [(thread_id,) for thread_id in thread_ids]
+        cur.executemany("DELETE FROM checkpoints WHERE thread_id = ?", rows)
+        cur.executemany("DELETE FROM writes WHERE thread_id = ?", rows)
+        cur.executemany("DELETE FROM thread_activity WHERE thread_id = ?", rows)
+
+    def delete_thread(self, thread_id):
+        """Forget a conversation thread entirely"""
+        with self.cursor() as cur:
+            self._delete_threads(cur, [str(thread_id)])
+
+    def prune(self):
+        """Evict expired threads, then the least recently used ones above `max_threads`"""
+        self.last_prune = time.time()
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT thread_id FROM thread_activity WHERE last_seen < ?",
+                (self.last_prune - self.ttl,),
+            )
+            expired = [row[0] for row in cur.fetchall()]
+            cur.execute(
+                "SELECT thread_id FROM thread_activity ORDER BY last_seen DESC LIMIT -1 OFFSET ?",
+                (self.max_threads,),
+            )
+            excess = [row[0] for row in cur.fetchall()]
+            evicted = set(expired) | set(excess)
+            if evicted:
+                self._delete_threads(cur, evicted)
+        if evicted:
+            print(f"Evicted {len(evicted)} conversation threads")
+        return len(evicted)
+
+
+@lru_cache(maxsize=None)
+def get_checkpointer():
+    """Return the process-wide checkpointer configured in `config`"""
+    if not state_store.is_shared():
+        return MemorySaver()
+    return BoundedSqliteSaver(
+        state_store.connect(),
+        ttl=config.CHECKPOINT_TTL,
+        max_threads=config.CHECKPOINT_MAX_THREADS,
+        keep_per_thread=config.CHECKPOINT_KEEP_PER_THREAD,
+        prune_interval=config.CHECKPOINT_PRUNE_INTERVAL,
+    )
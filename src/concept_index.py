@@ -0,0 +1,127 @@
+"""In-process vector index over CONCEPT embeddings, an alternative to Neo4j vector queries."""
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+import config
+from graph_store import get_graph_store
+
+
+class ConceptIndex:
+    """
+    Cosine-similarity top-k search over all concept embeddings held in one contiguous float32 matrix.
+
+    `load_rows(since)` returns (id, name, description, embedding, updated_at) rows changed after `since`
+    and `count()` the number of concepts in the source. Rows are keyed by the concept's node id, as
+    concepts of the same name in different sections are separate nodes. `refresh` only fetches
+    changed rows; it falls back to a full reload when concepts were deleted from the source.
+    Searches read an immutable snapshot, so refreshes never block them.
+    """
+
+    def __init__(self, load_rows, count, refresh_interval: float = 300.0):
+        self.load_rows = load_rows
+        self.count = count
+        self.refresh_interval = refresh_interval
+        self.ids, self.names, self.descriptions = [], [], []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.high_water = -1
+        self.last_refresh = 0.0
+        self.refresh_lock = threading.Lock()
+
+    @classmethod
+    def from_matrix(cls, names: list, descriptions: list, matrix):
+        """An index over fixed, unit-normalized embeddings (eg. memory-mapped from a snapshot) that never refreshes"""
+        index = cls(load_rows=lambda since: [], count=lambda: len(names), refresh_interval=float("inf"))
+        index.ids, index.names, index.descriptions = list(range(len(names))), list(names), list(descriptions)
+        index.matrix = matrix
+        index.last_refresh = time.time()
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _apply(self, rows, full: bool):
+        ids = [] if full else list(self.ids)
+        names = [] if full else list(self.names)
+        descriptions = [] if full else list(self.descriptions)
+        row_of = {concept_id: i for i, concept_id in enumerate(ids)}
+        updates, appended = {}, []
+        for concept_id, name, description, embedding, updated_at in rows:
+            self.high_water = max(self.high_water, updated_at)
+            if concept_id in row_of:
+                names[row_of[concept_id]] = name
+                descriptions[row_of[concept_id]] = description
+                updates[row_of[concept_id]] = embedding
+            else:
+                row_of[concept_id] = len(ids)
+                ids.append(concept_id)
+                names.append(name)
+                descriptions.append(description)
+                appended.append(embedding)
+        matrix = np.zeros((0, 0), dtype=np.float32) if full else self.matrix.copy()
+        for row, embedding in updates.items():
+            matrix[row] = self._normalize(embedding)
+        if appended:
+            new_rows = self._normalize(appended)
+            matrix = new_rows if matrix.size == 0 else np.vstack([matrix, new_rows])
+        # Swap in the new snapshot in one step; searches hold on to the previous one
+        self.ids, self.names, self.descriptions, self.matrix = ids, names, descriptions, np.ascontiguousarray(matrix)
+
+    def refresh(self, full: bool = False):
+        """Load concepts changed since the last refresh (or all of them when `full`)"""
+        with self.refresh_lock:
+            self._refresh(full)
+
+    def _refresh(self, full: bool):
+        rows = self.load_rows(-1 if full else self.high_water)
+        self._apply(rows, full)
+        if not full and len(self) != self.count():
+            self.high_water = -1
+            self._apply(self.load_rows(-1), full=True)
+        self.last_refresh = time.time()
+        print(f"Concept index holds {len(self)} concepts")
+
+    def _maybe_refresh(self):
+        if not self.last_refresh:
+            # Cold start: the first caller loads the index, concurrent ones wait for it
+            with self.refresh_lock:
+                if not self.last_refresh:
+                    self._refresh(full=True)
+        elif time.time() - self.last_refresh > self.refresh_interval and not self.refresh_lock.locked():
+            self.last_refresh = time.time()
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def search(self, embedding, top_n: int = 3):
+        """Return the `top_n` most similar concepts as (name, description, score), best first"""
+        self._maybe_refresh()
+        names, descriptions, matrix = self.names, self.descriptions, self.matrix
+        if not names:
+            return []
+        scores = matrix @ self._normalize(embedding)
+        top_n = min(top_n, len(names))
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        top = top[np.argsort(-scores[top])]
+        return [(names[i], descriptions[i], float(scores[i])) for i in top]
+
+
+@lru_cache(maxsize=None)
+def get_concept_index():
+    """Return the process-wide concept index, loaded from the knowledge graph"""
+    store = get_graph_store()
+    if hasattr(store, "concept_matrix"):
+        # A snapshot's embeddings never change and are already normalized: search them in place
+        return ConceptIndex.from_matrix(*store.concept_matrix())
+    return ConceptIndex(
+        load_rows=lambda since: get_graph_store().concept_rows(since),
+        count=lambda: get_graph_store().concept_count(),
+        refresh_interval=config.CONCEPT_INDEX_REFRESH_INTERVAL,
+    )
@@ -0,0 +1,124 @@
+"""Runtime settings for the API server and agent, read from environment variables."""
+import json
+import os
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# LLM clients
+CHAT_MODEL = os.getenv("SOCRATIX_CHAT_MODEL", "gpt-4o-mini")
+EMBEDDING_MODEL = os.getenv("SOCRATIX_EMBEDDING_MODEL", "text-embedding-ada-002")
+LLM_MAX_CONNECTIONS = _env_int("SOCRATIX_LLM_MAX_CONNECTIONS", 100)
+LLM_MAX_KEEPALIVE = _env_int("SOCRATIX_LLM_MAX_KEEPALIVE", 20)
+LLM_KEEPALIVE_EXPIRY = _env_float("SOCRATIX_LLM_KEEPALIVE_EXPIRY", 60.0)
+LLM_TIMEOUT = _env_float("SOCRATIX_LLM_TIMEOUT", 60.0)
+
+# LLM scheduler: request and token budgets per model and minute; SOCRATIX_LLM_RATE_LIMITS overrides them
+# per model, eg. {"gpt-4o": {"rpm": 500, "tpm": 30000}}
+LLM_REQUESTS_PER_MINUTE = _env_int("SOCRATIX_LLM_RPM", 500)
+LLM_TOKENS_PER_MINUTE = _env_int("SOCRATIX_LLM_TPM", 200000)
+LLM_RATE_LIMITS = json.loads(os.getenv("SOCRATIX_LLM_RATE_LIMITS", '{"gemini-2.0-flash-exp": {"rpm": 2}}'))
+LLM_MAX_RETRIES = _env_int("SOCRATIX_LLM_MAX_RETRIES", 5)
+# Completion tokens charged up front for requests without max_tokens, until the response reports its usage
+LLM_COMPLETION_TOKENS = _env_int("SOCRATIX_LLM_COMPLETION_TOKENS", 512)
+LLM_BACKOFF_BASE = _env_float("SOCRATIX_LLM_BACKOFF_BASE", 1.0)
+LLM_BACKOFF_MAX = _env_float("SOCRATIX_LLM_BACKOFF_MAX", 60.0)
+
+# Model calls: "live", "record" (live, and saved to the cassette directory), "replay" (served from it)
+# or "fake" (canned answers, see fake_llm.py). Replayed calls take as long as when they were recorded
+# unless SOCRATIX_LLM_REPLAY_LATENCY sets the seconds.
+LLM_MODE = os.getenv("SOCRATIX_LLM_MODE", "live")
+# Anchored to the repository, as the API runs from src/ and the pipeline scripts from src/kb/
+LLM_CASSETTE_DIR = os.getenv("SOCRATIX_LLM_CASSETTE_DIR",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cassettes"))
+LLM_REPLAY_LATENCY = _env_float("SOCRATIX_LLM_REPLAY_LATENCY", None)
+FAKE_LLM_LATENCY = _env_float("SOCRATIX_FAKE_LLM_LATENCY", 0.5)
+FAKE_LLM_JITTER = _env_float("SOCRATIX_FAKE_LLM_JITTER", 0.3)
+
+# Neo4j driver: one pooled driver per process (credentials come from neo4j.txt)
+NEO4J_MAX_POOL_SIZE = _env_int("SOCRATIX_NEO4J_MAX_POOL_SIZE", 50)
+NEO4J_ACQUISITION_TIMEOUT = _env_float("SOCRATIX_NEO4J_ACQUISITION_TIMEOUT", 10.0)
+NEO4J_CONNECTION_TIMEOUT = _env_float("SOCRATIX_NEO4J_CONNECTION_TIMEOUT", 10.0)
+NEO4J_MAX_CONNECTION_LIFETIME = _env_float("SOCRATIX_NEO4J_MAX_CONNECTION_LIFETIME", 30 * 60)
+NEO4J_LIVENESS_CHECK_TIMEOUT = _env_float("SOCRATIX_NEO4J_LIVENESS_CHECK_TIMEOUT", 60.0)
+
+# Knowledge graph: "neo4j", "memory" to serve the JSON curriculum at SOCRATIX_GRAPH_STORE_PATH
+# (a generated one if unset), or "snapshot" to serve the snapshot file at SOCRATIX_GRAPH_STORE_PATH
+# read-only (see snapshot.py)
+GRAPH_STORE = os.getenv("SOCRATIX_GRAPH_STORE", "neo4j")
+GRAPH_STORE_PATH = os.getenv("SOCRATIX_GRAPH_STORE_PATH", "")
+# Curriculum responses are cached until the knowledge-base version stamp changes; it is re-read this often
+KB_VERSION_CHECK_INTERVAL = _env_float("SOCRATIX_KB_VERSION_CHECK_INTERVAL", 30.0)
+
+# Conversation state (checkpoints and chat history): "sqlite" shares it between API worker processes
+# through the SQLite file SOCRATIX_CHECKPOINT_DB, "memory" keeps it in the process (single worker)
+STATE_STORE = os.getenv("SOCRATIX_STATE_STORE", "sqlite")
+STATE_BUSY_TIMEOUT = _env_float("SOCRATIX_STATE_BUSY_TIMEOUT", 30.0)
+# API worker processes on this host; each one's LLM scheduler gets an equal share of the budgets
+WORKERS = _env_int("SOCRATIX_WORKERS", _env_int("WEB_CONCURRENCY", 1))
+
+# Conversation checkpoints
+CHECKPOINT_DB = os.getenv("SOCRATIX_CHECKPOINT_DB", "checkpoints.sqlite")
+CHECKPOINT_TTL = _env_float("SOCRATIX_CHECKPOINT_TTL", 6 * 60 * 60)
+CHECKPOINT_MAX_THREADS = _env_int("SOCRATIX_CHECKPOINT_MAX_THREADS", 10000)
+CHECKPOINT_KEEP_PER_THREAD = _env_int("SOCRATIX_CHECKPOINT_KEEP_PER_THREAD", 2)
+CHECKPOINT_PRUNE_INTERVAL = _env_float("SOCRATIX_CHECKPOINT_PRUNE_INTERVAL", 60.0)
+
+# Dash frontend
+CHAT_STREAMING = os.getenv("SOCRATIX_CHAT_STREAMING", "1") == "1"
+# "http" calls the API server at SOCRATIX_API_BASE_URL over pooled connections; "inprocess" runs the
+# API inside the frontend process and serves it under /api of the Dash server
+FRONTEND_API_MODE = os.getenv("SOCRATIX_FRONTEND_API_MODE", "http")
+API_BASE_URL = os.getenv("SOCRATIX_API_BASE_URL", "http://localhost:5000/api")
+FRONTEND_API_POOL_SIZE = _env_int("SOCRATIX_FRONTEND_API_POOL_SIZE", 20)
+FRONTEND_API_RETRIES = _env_int("SOCRATIX_FRONTEND_API_RETRIES", 2)
+FRONTEND_CONNECT_TIMEOUT = _env_float("SOCRATIX_FRONTEND_CONNECT_TIMEOUT", 3.0)
+FRONTEND_API_TIMEOUT = _env_float("SOCRATIX_FRONTEND_API_TIMEOUT", 30.0)
+FRONTEND_CHAT_TIMEOUT = _env_float("SOCRATIX_FRONTEND_CHAT_TIMEOUT", 180.0)
+# Topics whose content the frontend keeps (with their ETags) between page views
+TOPIC_CACHE_SIZE = _env_int("SOCRATIX_TOPIC_CACHE_SIZE", 256)
+
+# Personalization: "post" runs a separate narration call after the graph, "inline" has the
+# chatbot personalize its own answer, "node" runs a narrator node only for long explanations.
+PERSONALIZATION_MODE = os.getenv("SOCRATIX_PERSONALIZATION_MODE", "post")
+NARRATION_MIN_CHARS = _env_int("SOCRATIX_NARRATION_MIN_CHARS", 400)
+
+# Chat panel history: the last turns of each session, for the most recently active sessions
+CHAT_HISTORY_MAX_TURNS = _env_int("SOCRATIX_CHAT_HISTORY_MAX_TURNS", 100)
+CHAT_HISTORY_MAX_SESSIONS = _env_int("SOCRATIX_CHAT_HISTORY_MAX_SESSIONS", 10000)
+
+# Conversation history sent to the chatbot
+HISTORY_TOKEN_BUDGET = _env_int("SOCRATIX_HISTORY_TOKEN_BUDGET", 3000)
+HISTORY_KEEP_TURNS = _env_int("SOCRATIX_HISTORY_KEEP_TURNS", 2)
+
+# Embedding cache: an in-process LRU in front of an on-disk store (set the directory empty to disable it)
+EMBEDDING_CACHE_SIZE = _env_int("SOCRATIX_EMBEDDING_CACHE_SIZE", 10000)
+EMBEDDING_CACHE_DIR = os.getenv("SOCRATIX_EMBEDDING_CACHE_DIR", ".cache/embeddings")
+EMBEDDING_CACHE_DISK_LIMIT = _env_int("SOCRATIX_EMBEDDING_CACHE_DISK_LIMIT", 1024 ** 3)
+
+# Semantic response cache for the first turn of a conversation (opt-in)
+RESPONSE_CACHE_ENABLED = os.getenv("SOCRATIX_RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_THRESHOLD = _env_float("SOCRATIX_RESPONSE_CACHE_THRESHOLD", 0.95)
+RESPONSE_CACHE_TTL = _env_float("SOCRATIX_RESPONSE_CACHE_TTL", 24 * 60 * 60)
+RESPONSE_CACHE_MAX_ENTRIES = _env_int("SOCRATIX_RESPONSE_CACHE_MAX_ENTRIES", 5000)
+
+# Concept retrieval: "numpy" keeps all concept embeddings in memory, "neo4j" queries the vector index
+RETRIEVAL_BACKEND = os.getenv("SOCRATIX_RETRIEVAL_BACKEND", "numpy")
+CONCEPT_INDEX_REFRESH_INTERVAL = _env_float("SOCRATIX_CONCEPT_INDEX_REFRESH_INTERVAL", 300.0)
+
+# Tracing: latency quantiles are computed over this many recent spans of each kind and name
+TRACE_WINDOW = _env_int("SOCRATIX_TRACE_WINDOW", 2048)
+
+# Student personas
+PROFILES_PATH = os.getenv("SOCRATIX_PROFILES_PATH", "../profiles/students.json")
+
+# Tool calls from one chatbot message run concurrently, at most this many at a time
+TOOL_CONCURRENCY = _env_int("SOCRATIX_TOOL_CONCURRENCY", 4)
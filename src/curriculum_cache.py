@@ -0,0 +1,81 @@
+"""Read-through cache of the curriculum endpoints, keyed by the knowledge-base version stamp."""
+import hashlib
+import json
+import threading
+from functools import lru_cache
+
+import config
+from cached_loader import CachedLoader
+from graph_store import get_graph_store
+
+
+class CurriculumCache:
+    """
+    Serialized curriculum responses for the current knowledge-base version.
+
+    The version is read from the store at most every `check_interval` seconds; when it changes
+    every cached response is dropped. Between checks, cached responses and ETag validation cost
+    no database round trips.
+    """
+
+    def __init__(self, store, check_interval: float):
+        self.store = store
+        self.version = CachedLoader(store.kb_version, check_interval)
+        self.cached_version = None
+        self.bodies = {}  # key -> serialized JSON
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    @staticmethod
+    def etag(version: str, key: str) -> str:
+        """The response for `key` is fixed by the version, so the ETag needs neither the body nor the cache"""
+        return hashlib.sha1(f"{version}\0{key}".encode("utf-8")).hexdigest()[:32]
+
+    def current(self) -> str:
+        version = self.version.get()
+        with self.lock:
+            if version != self.cached_version:
+                if self.cached_version is not None:
+                    self.counts["invalidations"] += 1
+                    print(f"Knowledge base version changed to {version}, dropping cached curriculum")
+                self.bodies.clear()
+                self.cached_version = version
+        return version
+
+    def not_modified(self):
+        with self.lock:
+            self.counts["not_modified"] += 1
+
+    def get(self, key: str, load):
+        """
+        Return (serialized JSON, found) for `key`, calling `load()` on a miss.
+
+        `load` returns the payload, or None when the item does not exist; misses for missing
+        items are not cached, so unknown names cannot fill the cache.
+        """
+        version = self.current()
+        with self.lock:
+            body = self.bodies.get(key)
+            self.counts["hits" if body is not None else "misses"] += 1
+        if body is not None:
+            return body, True
+        payload = load()
+        if payload is None:
+            return None, False
+        body = json.dumps(payload)
+        with self.lock:
+            # Do not store a body loaded under a version that has been replaced meanwhile
+            if self.cached_version == version:
+                self.bodies[key] = body
+        return body, True
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"version": self.cached_version, "entries": len(self.bodies),
+                    "bytes": sum(len(body) for body in self.bodies.values()), **self.counts}
+
+
+@lru_cache(maxsize=None)
+def get_curriculum_cache() -> CurriculumCache:
+    """Return the process-wide curriculum cache over the configured graph store"""
+    return CurriculumCache(get_graph_store(), config.KB_VERSION_CHECK_INTERVAL)
@@ -1,17 +1,113 @@
-import openai
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from neo4j import GraphDatabase
-from openai import OpenAI
+"""Process-wide Neo4j driver with a tuned connection pool, shared by the API and the agent tools."""
 import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from neo4j import GraphDatabase
 
 # Neo4j connection setup
 from dotenv import load_dotenv
-load_dotenv('neo4j.txt')
 
-# Set credentials from environment variables
-uri = os.getenv('NEO4J_URI')
-user = os.getenv('NEO4J_USERNAME') 
-password = os.getenv('NEO4J_PASSWORD')
+import config
+
+
+@lru_cache(maxsize=None)
+def get_credentials() -> dict:
+    """Read the Neo4j credentials from neo4j.txt (or the environment) once per process"""
+    load_dotenv('neo4j.txt')
+    return {
+        'uri': os.getenv('NEO4J_URI'),
+        'user': os.getenv('NEO4J_USERNAME'),
+        'password': os.getenv('NEO4J_PASSWORD'),
+    }
+
+
+class PoolStats:
+    """Sessions in use on the shared driver and how long queries held them"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.sessions = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def opened(self):
+        with self.lock:
+            self.in_use += 1
+            self.sessions += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def closed(self, seconds: float, error: bool):
+        with self.lock:
+            self.in_use -= 1
+            self.busy_seconds += seconds
+            self.errors += 1 if error else 0
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "sessions_in_use": self.in_use,
+                "peak_sessions_in_use": self.peak_in_use,
+                "sessions_total": self.sessions,
+                "session_errors": self.errors,
+                "busy_seconds": round(self.busy_seconds, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+@lru_cache(maxsize=None)
+def get_driver():
+    """Return the process-wide Neo4j driver; connections are opened lazily and pooled"""
+    credentials = get_credentials()
+    return GraphDatabase.driver(
+        credentials['uri'],
+        auth=(credentials['user'], credentials['password']),
+        max_connection_pool_size=config.NEO4J_MAX_POOL_SIZE,
+        connection_acquisition_timeout=config.NEO4J_ACQUISITION_TIMEOUT,
+        connection_timeout=config.NEO4J_CONNECTION_TIMEOUT,
+        max_connection_lifetime=config.NEO4J_MAX_CONNECTION_LIFETIME,
+        # Idle connections older than this are pinged before reuse, so dropped ones are replaced
+        liveness_check_timeout=config.NEO4J_LIVENESS_CHECK_TIMEOUT,
+    )
+
+
+@contextmanager
+def session(**kwargs):
+    """A session on the shared driver, counted in the pool metrics"""
+    started = time.perf_counter()
+    error = False
+    pool_stats.opened()
+    try:
+        with get_driver().session(**kwargs) as neo4j_session:
+            yield neo4j_session
+    except Exception:
+        error = True
+        raise
+    finally:
+        pool_stats.closed(time.perf_counter() - started, error)
+
+
+def health_check() -> dict:
+    """Check that the database is reachable; returns {"ok": bool, "latency_ms": ..., "error": ...}"""
+    started = time.perf_counter()
+    try:
+        get_driver().verify_connectivity()
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "latency_ms": round((time.perf_counter() - started) * 1000, 1), "error": str(e)}
+
+
+def pool_metrics() -> dict:
+    """Session counters kept by `session()`; the driver exposes no public pool statistics"""
+    return {**pool_stats.to_dict(), "max_pool_size": config.NEO4J_MAX_POOL_SIZE}
 
-driver = GraphDatabase.driver(uri, auth=(user, password))
\ No newline at end of file
+def close():
+    if get_driver.cache_info().currsize:
+        get_driver().close()
+        get_driver.cache_clear()
@@ -0,0 +1,98 @@
+"""Two-level cache for text embeddings: an in-process LRU backed by an on-disk diskcache store."""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import diskcache
+import numpy as np
+
+import config
+
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace differences should not cost another embedding call"""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by model name and normalized text.
+
+    Vectors are kept as float32 arrays. Lookups go to the in-process LRU first, then to the
+    on-disk store (shared by every process using the same directory), and only then to `compute`.
+    """
+
+    def __init__(self, max_items: int, directory: str = None, disk_size_limit: int = 1024 ** 3):
+        self.max_items = max_items
+        self.memory = OrderedDict()
+        self.disk = diskcache.Cache(directory, size_limit=disk_size_limit) if directory else None
+        self.lock = threading.Lock()
+        self.counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        with self.lock:
+            self.memory[key] = vector
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+
+    def get(self, text: str, model: str):
+        """Return the cached vector, or None"""
+        key = self.key(text, model)
+        with self.lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                self.counts["memory_hits"] += 1
+                return vector
+        if self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                vector = np.frombuffer(stored, dtype=np.float32)
+                self._remember(key, vector)
+                with self.lock:
+                    self.counts["disk_hits"] += 1
+                return vector
+        with self.lock:
+            self.counts["misses"] += 1
+        return None
+
+    def put(self, text: str, model: str, vector):
+        key = self.key(text, model)
+        vector = np.asarray(vector, dtype=np.float32)
+        self._remember(key, vector)
+        if self.disk is not None:
+            self.disk.set(key, vector.tobytes())
+        return vector
+
+    def get_or_compute(self, text: str, model: str, compute):
+        """Return the cached embedding of `text`, calling `compute(text)` on a miss"""
+        vector = self.get(text, model)
+        if vector is None:
+            vector = self.put(text, model, compute(text))
+        return vector
+
+    def stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.counts)
+            stats["memory_items"] = len(self.memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        if self.disk is not None:
+            stats["disk_items"] = len(self.disk)
+        return stats
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache():
+    """Return the process-wide embedding cache configured in `config`"""
+    return EmbeddingCache(
+        max_items=config.EMBEDDING_CACHE_SIZE,
+        directory=config.EMBEDDING_CACHE_DIR or None,
+        disk_size_limit=config.EMBEDDING_CACHE_DISK_LIMIT,
+    )
@@ -0,0 +1,124 @@
+"""A stand-in for the OpenAI API with configurable latency, for load tests without provider keys."""
+import hashlib
+import json
+import random
+import time
+
+import httpx
+import numpy as np
+
+import config
+from llm_cassette import ReplayStream
+
+
+def fake_embedding(text: str, dimensions: int = 1536) -> np.ndarray:
+    """A deterministic unit vector for `text`"""
+    seed = int.from_bytes(hashlib.sha1(str(text).encode("utf-8")).digest()[:4], "big")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def last_user_message(messages: list) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+class FakeOpenAITransport(httpx.BaseTransport):
+    """
+    Answers chat completion, embedding and model-list requests locally.
+
+    Every request takes `latency` seconds, give or take `jitter` (a fraction of `latency`).
+    When tools are offered, every other student message gets a FoundationConceptFetcher call
+    first, so load tests exercise the tool path too.
+    """
+
+    def __init__(self, latency: float = None, jitter: float = None, seed: int = None):
+        self.latency = config.FAKE_LLM_LATENCY if latency is None else latency
+        self.jitter = config.FAKE_LLM_JITTER if jitter is None else jitter
+        self.random = random.Random(seed)
+
+    def delay(self) -> float:
+        return max(0.0, self.latency * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        path = request.url.path
+        if path.endswith("/embeddings"):
+            time.sleep(self.delay())
+            return httpx.Response(200, json=self.embeddings(body))
+        if path.endswith("/chat/completions"):
+            message = self.reply(body)
+            if body.get("stream"):
+                return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                      stream=ReplayStream(self.stream_body(body, message), self.delay()))
+            time.sleep(self.delay())
+            return httpx.Response(200, json=self.completion(body, message))
+        if path.endswith("/models"):
+            return httpx.Response(200, json={"object": "list", "data": [{"id": config.CHAT_MODEL, "object": "model"}]})
+        return httpx.Response(404, json={"error": {"message": f"{path} is not faked"}})
+
+    def embeddings(self, body: dict) -> dict:
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = [{"object": "embedding", "index": i, "embedding": fake_embedding(text).tolist()}
+                for i, text in enumerate(inputs)]
+        tokens = sum(len(str(text)) // 4 for text in inputs)
+        return {"object": "list", "data": data, "model": body.get("model"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def reply(self, body: dict) -> dict:
+        messages = body.get("messages", [])
+        question = last_user_message(messages)
+        tool_choice = body.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            # Structured output: the model is forced to call the schema's function
+            arguments = {"questions": [f"What do you already know about {question[:40]}?", "Can you give an example?"]}
+            return self.tool_call(tool_choice["function"]["name"], arguments)
+        offered = {tool["function"]["name"] for tool in body.get("tools", [])}
+        answered_tools = messages and messages[-1].get("role") == "tool"
+        digest = hashlib.sha1(question.encode("utf-8")).digest()[0]
+        if "FoundationConceptFetcher" in offered and not answered_tools and digest % 2 == 0:
+            return self.tool_call("FoundationConceptFetcher", {"topic": question[:200]})
+        sentence = f"Let us think about this together: what do you notice about {question[:60]}? "
+        return {"role": "assistant", "content": sentence * 8}
+
+    def tool_call(self, name: str, arguments: dict) -> dict:
+        call_id = "call_" + hashlib.sha1(f"{name}{arguments}{self.random.random()}".encode()).hexdigest()[:16]
+        return {"role": "assistant", "content": None, "tool_calls": [
+            {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+        ]}
+
+    def usage(self, body: dict, message: dict) -> dict:
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def completion(self, body: dict, message: dict) -> dict:
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        return {"id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model"), "usage": self.usage(body, message),
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}]}
+
+    def stream_body(self, body: dict, message: dict) -> bytes:
+        def chunk(delta, finish_reason=None, usage=None):
+            choices = [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            data = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": body.get("model"), "choices": choices}
+            if usage:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        if message.get("tool_calls"):
+            calls = [{"index": i, **call} for i, call in enumerate(message["tool_calls"])]
+            events.append(chunk({"tool_calls": calls}, "tool_calls"))
+        else:
+            words = message["content"].split(" ")
+            events += [chunk({"content": word + " "}) for word in words]
+            events.append(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append(chunk(None, usage=self.usage(body, message)))
+        events.append("data: [DONE]\n\n")
+        return "".join(events).encode("utf-8")
@@ -2,26 +2,31 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import StateGraph, START, END
-from graph_nodes import chatbot, router, tool_node
+from graph_nodes import chatbot, narrator, router, tool_node
 from state import State
 from langchain_core.messages import AIMessage
 from langchain_core.tools import tool
 
-from langgraph.checkpoint.memory import MemorySaver
-
-memory = MemorySaver()
+from checkpointer import get_checkpointer
 
 from langgraph.prebuilt import ToolNode
-def build_graph():
+from functools import lru_cache
+
+def build_graph(checkpointer=None):
     graph_builder = StateGraph(State)
     graph_builder.add_node("chatbot", chatbot)
     graph_builder.add_node("tools", tool_node)
+    graph_builder.add_node("narrator", narrator)
 
     graph_builder.add_edge(START, "chatbot")
     graph_builder.add_conditional_edges("chatbot", router)
     graph_builder.add_edge("tools", "chatbot")
+    graph_builder.add_edge("narrator", END)
     
-    graph = graph_builder.compile(checkpointer=memory)
+    graph = graph_builder.compile(checkpointer=checkpointer or get_checkpointer())
     return graph
 
-
+@lru_cache(maxsize=None)
+def get_graph():
+    """Compile the teacher graph once per process and reuse it for every request"""
+    return build_graph()
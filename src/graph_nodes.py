@@ -1,4 +1,3 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from typing import Annotated, Literal
@@ -6,59 +5,94 @@ from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from state import State
-from langgraph.prebuilt import ToolNode
-from agent_tools import QuestionCreator, FoundationConceptFetcher, PersonalizedNarrator
-import json
-from random import choice
-from prompts import AI_TEACHER_PROMPT
+from tool_runner import TeacherToolRunner
+from agent_tools import QuestionCreator, FoundationConceptFetcher, PrerequisiteFinder, PersonalizedNarrator
+from langchain_core.runnables import RunnableConfig
+from prompts import AI_TEACHER_PROMPT, TEACHER_TOOLS_PROMPT, TEACHER_TOOL_DESCRIPTIONS, TOPIC_PROMPT, POST_PERSONALIZATION_PROMPT, INLINE_PERSONALIZATION_PROMPT, NARRATOR_NODE_PROMPT
+from personas import get_persona_registry
+from functools import lru_cache
+from llm_clients import get_chat_model
+from agent_tools import create_personalized_narration
+from langchain_core.messages import AIMessage
+import config as settings
+from history import fit_history, latest_topic
 
-tools = [QuestionCreator, FoundationConceptFetcher, PersonalizedNarrator]
-tool_node = ToolNode(tools)
+tools = [QuestionCreator, FoundationConceptFetcher, PrerequisiteFinder, PersonalizedNarrator]
+tool_node = TeacherToolRunner(tools).as_node()
 
-with open("../profiles/students.json", "r") as f:
-    data = json.load(f)
+def get_llm():
+    return get_chat_model()
 
-student = choice(data)
-persona = student['persona']
+def teacher_tools(mode=None):
+    """The tools offered to the teacher model in a personalization mode"""
+    mode = mode or settings.PERSONALIZATION_MODE
+    if mode == "post":
+        return tools
+    # Personalization happens inside the graph, so the narrator tool is not offered
+    return [t for t in tools if t is not PersonalizedNarrator]
 
-def get_llm():
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    return llm
+@lru_cache(maxsize=None)
+def teacher_system_message(mode=None):
+    """
+    The teacher prompt, listing exactly the tools that are bound.
+
+    Identical for every student and turn, so it leads the prompt and stays cacheable by the provider.
+    """
+    listed = "\n".join(f"{i + 1}. {t.__name__}: {TEACHER_TOOL_DESCRIPTIONS[t.__name__]}"
+                       for i, t in enumerate(teacher_tools(mode)))
+    return {"role": "system", "content": AI_TEACHER_PROMPT + TEACHER_TOOLS_PROMPT.format(tools=listed)}
+
+@lru_cache(maxsize=None)
+def get_llm_with_tools(mode=None):
+    """Bind the teacher tools once and reuse the bound model for every turn"""
+    return get_llm().bind_tools(teacher_tools(mode))
 
-def chatbot(state: State):
-    llm = get_llm()
-    profile_message = {"role": "system", "content": f"""
-                        The student you are talking to is {persona['name']}. Here is their profile:
-                        {json.dumps(persona, indent=4)}
-                          
-                        Formulate your responses in a way that engages the student and aligns with their learning style, weaknesses, and strengths, current knowledge, interests, and goals.
-                        you have access to the following tools:
-                        1. QuestionCreator: This tool is used to create one or more questions based on the foundation concepts and the content of the topic.
-                        2. FoundationConceptFetcher: This tool is used to get the related concepts and prerequisites for the topic.
-                        3. PersonalizedNarrator: This tool is used to create a personalized narration based on the student's profile.
-                
-                        """}
-    sys_message = {"role": "system", "content": f"""
-                   {AI_TEACHER_PROMPT}
-                   The topic currently being taught is:
-                   {state["messages"][-2].content}
-                   guide the student to understand the topic.
-                   """}
-    messages = [sys_message,profile_message] + state["messages"]
-    print("messages are", messages)
-    tools = [QuestionCreator, FoundationConceptFetcher, PersonalizedNarrator]
-    llm_with_tools = llm.bind_tools(tools)
-    response = llm_with_tools.invoke(messages) 
+PERSONALIZATION_PROMPTS = {
+    "post": POST_PERSONALIZATION_PROMPT,
+    "inline": INLINE_PERSONALIZATION_PROMPT,
+    "node": NARRATOR_NODE_PROMPT,
+}
+
+def get_persona(config: RunnableConfig):
+    """Persona of the student in this conversation, as chosen by the caller of the graph"""
+    configurable = (config or {}).get("configurable", {})
+    return get_persona_registry().resolve(configurable.get("student_id"), configurable.get("thread_id", "default"))
+
+def chatbot(state: State, config: RunnableConfig):
+    # Most stable first: teacher prompt, then persona, then mode, then the per-turn parts
+    messages = [teacher_system_message(settings.PERSONALIZATION_MODE), get_persona(config).system_message]
+    if settings.PERSONALIZATION_MODE in PERSONALIZATION_PROMPTS:
+        messages.append({"role": "system", "content": PERSONALIZATION_PROMPTS[settings.PERSONALIZATION_MODE]})
+    messages.append({"role": "system", "content": TOPIC_PROMPT.format(topic=latest_topic(state["messages"]))})
+    history, summary, removals = fit_history(state["messages"], state.get("summary", ""))
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation with the student:\n{summary}"})
+    messages += history
+    response = get_llm_with_tools().invoke(messages)
     # print("response is", response)
-    return {"messages": [response]} 
+    return {"messages": removals + [response], "narrated": False, "summary": summary}
+
+def narrator(state: State, config: RunnableConfig):
+    """Personalize the chatbot's final answer in place"""
+    last_message = state['messages'][-1]
+    narration = create_personalized_narration(last_message.content, get_persona(config).profile_json)
+    # Reusing the message id replaces the unpersonalized answer in the conversation
+    return {"messages": [AIMessage(content=narration, id=last_message.id)], "narrated": True}
+
+def needs_narration(message) -> bool:
+    """Only explanations are worth a narration pass; short Socratic questions go out as they are"""
+    return len(message.content or "") >= settings.NARRATION_MIN_CHARS
 
 
 
-def router(state: State)-> Literal["tools", END]:
+def router(state: State)-> Literal["tools", "narrator", END]:
     messages = state['messages']
     last_message = messages[-1]
     # If the LLM makes a tool call, then we route to the "tools" node
     if last_message.tool_calls:
         return "tools"
+    # In "node" mode, explanations are personalized before replying
+    if settings.PERSONALIZATION_MODE == "node" and needs_narration(last_message):
+        return "narrator"
     # Otherwise, we stop (reply to the user)
-    return END
\ No newline at end of file
+    return END
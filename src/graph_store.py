@@ -0,0 +1,361 @@
+"""
+Read access to the knowledge graph: chapters, sections and concepts.
+
+`Neo4jGraphStore` runs the Cypher queries against the database; `InMemoryGraphStore` answers
+the same calls from a curriculum held in memory (a JSON file or generated data), for load tests
+and local runs without Neo4j. `snapshot.SnapshotGraphStore` serves an exported snapshot file.
+"""
+import hashlib
+import json
+import random
+import re
+from functools import lru_cache
+
+import numpy as np
+
+import config
+import db
+from tracing import span
+
+
+def neo4j_query(cypher_query: str, parameters: dict = None) -> list:
+    """Run a Cypher query on the shared, pooled driver and return the records as dictionaries"""
+    with db.session() as session:
+        return [dict(record) for record in session.run(cypher_query, parameters or {})]
+
+
+def section_order(section_no) -> tuple:
+    """Sort key for section numbers such as "1.10" or 2; sections without a number go last"""
+    numbers = [int(n) for n in re.findall(r"\d+", str(section_no if section_no is not None else ""))]
+    return (0, numbers) if numbers else (1, [])
+
+
+def manifest_topics(topics: list) -> list:
+    """Order a chapter's topics by section number and record their position"""
+    ordered = sorted(topics, key=lambda topic: section_order(topic.get("section_no")))
+    return [{**topic, "position": position} for position, topic in enumerate(ordered)]
+
+
+class Neo4jGraphStore:
+    """The knowledge graph in Neo4j, queried through `run_query(cypher, parameters) -> list of dicts`"""
+
+    def __init__(self, run_query=neo4j_query):
+        self.run_query = run_query
+
+    def run(self, name: str, cypher_query: str, **parameters) -> list:
+        with span("neo4j", name):
+            return self.run_query(cypher_query, parameters)
+
+    def kb_version(self) -> str:
+        """The version stamp written by kb/data_pipeline.py, or "unversioned" for a graph without one"""
+        results = self.run("kb_version", "MATCH (v:KB_VERSION) RETURN v.version AS version LIMIT 1")
+        return str(results[0]["version"]) if results and results[0]["version"] is not None else "unversioned"
+
+    def chapters(self) -> list:
+        results = self.run("chapters", """
+            MATCH (c:CHAPTER)
+            OPTIONAL MATCH (c)-[:HAS_content]->(s:SECTION)
+            WITH c, collect(s) as sections
+            RETURN collect({
+                chapter_name: c.chapter_name,
+                chapter_no: c.chapter_no,
+                topics: [section IN sections | {
+                    section_name: section.section_name,
+                    title: section.section_name,
+                    content: toString(section.page_no)
+                }]
+            }) as chapters
+            """)
+        chapters = results[0].get('chapters', []) if results else []
+        # Filter out any null or empty chapters
+        return [chapter for chapter in chapters if chapter.get('chapter_name')]
+
+    def chapter(self, chapter_name: str):
+        results = self.run("chapter", """
+            MATCH (c:CHAPTER {chapter_name: $chapter_name})
+            OPTIONAL MATCH (c)-[:HAS_content]->(s:SECTION)
+            WITH c, collect(s) as sections
+            RETURN {
+                chapter_name: c.chapter_name,
+                chapter_no: c.chapter_no,
+                topics: [section IN sections | {
+                    section_name: section.section_name,
+                    title: section.section_name,
+                    content: section.section_content,
+                    section_no: section.section_no
+                }]
+            } as result
+            """, chapter_name=chapter_name)
+        return results[0].get('result') if results else None
+
+    def chapter_manifest(self, chapter_name: str):
+        """The chapter's topics in order, with their sizes but without their content"""
+        results = self.run("chapter_manifest", """
+            MATCH (c:CHAPTER {chapter_name: $chapter_name})
+            OPTIONAL MATCH (c)-[:HAS_content]->(s:SECTION)
+            WITH c, collect(s) as sections
+            RETURN {
+                chapter_name: c.chapter_name,
+                chapter_no: c.chapter_no,
+                topics: [section IN sections | {
+                    section_name: section.section_name,
+                    title: section.section_name,
+                    section_no: section.section_no,
+                    page_no: section.page_no,
+                    content_chars: size(coalesce(section.section_content, ''))
+                }]
+            } as manifest
+            """, chapter_name=chapter_name)
+        manifest = results[0].get('manifest') if results else None
+        if manifest is None:
+            return None
+        return {**manifest, "topics": manifest_topics(manifest["topics"])}
+
+    def topic(self, section_name: str):
+        results = self.run("topic", """
+            MATCH (s:SECTION {section_name: $section_name})
+            RETURN {
+                section_name: s.section_name,
+                title: s.section_name,
+                content: s.section_content,
+                section_no: s.section_no
+            } as section
+            """, section_name=section_name)
+        return results[0].get('section') if results else None
+
+    def chapter_names(self) -> list:
+        results = self.run("chapter_names", """
+            MATCH (c:CHAPTER)
+            RETURN collect({
+                chapter_name: c.chapter_name,
+                chapter_no: c.chapter_no
+            }) as chapters
+            """)
+        return results[0].get('chapters', []) if results else []
+
+    def concept_rows(self, since: float) -> list:
+        """(id, name, description, embedding, updated_at) of concepts whose embedding was written after `since` (ms)"""
+        results = self.run("concept_embeddings", """
+            MATCH (c:CONCEPT)
+            WHERE c.embedding IS NOT NULL AND coalesce(c.embedding_updated_at, 0) > $since
+            RETURN elementId(c) AS id, c.concept_name AS name, c.concept_description AS description,
+                   c.embedding AS embedding, coalesce(c.embedding_updated_at, 0) AS updated_at
+            """, since=since)
+        return [(r["id"], r["name"], r["description"], r["embedding"], r["updated_at"]) for r in results]
+
+    def concept_count(self) -> int:
+        results = self.run("concept_count", "MATCH (c:CONCEPT) WHERE c.embedding IS NOT NULL RETURN count(c) AS count")
+        return results[0]["count"]
+
+    def prerequisite_rows(self) -> list:
+        """(name, description, comma-joined prerequisites) for every concept"""
+        results = self.run("prerequisites", """
+            MATCH (c:CONCEPT)
+            RETURN elementId(c) AS id, c.concept_name AS name, c.concept_description AS description, c.prerequisites AS prerequisites
+            """)
+        return [(r["name"], r["description"], r["prerequisites"]) for r in results]
+
+    def question_rows(self) -> list:
+        """(concept name, questions) for every concept that has a question bank"""
+        results = self.run("question_bank", """
+            MATCH (c:CONCEPT)
+            WHERE c.questions IS NOT NULL
+            RETURN c.concept_name AS name, c.questions AS questions
+            """)
+        return [(r["name"], r["questions"]) for r in results]
+
+    def export(self) -> dict:
+        """The whole knowledge graph in the data layout of `InMemoryGraphStore`, for snapshots"""
+        chapters = self.run("export_chapters", """
+            MATCH (c:CHAPTER)
+            OPTIONAL MATCH (c)-[:HAS_content]->(s:SECTION)
+            OPTIONAL MATCH (s)-[:HAS_sub_sections]->(ss:SUBSECTION)
+            WITH c, s, collect(ss {.sub_section_name, .sub_section_no, .page_no}) AS subsections
+            WITH c, collect(s {.section_name, .section_no, .page_no, .section_content, subsections: subsections}) AS sections
+            RETURN c.chapter_name AS chapter_name, c.chapter_no AS chapter_no, sections
+            """)
+        concepts = self.run("export_concepts", """
+            MATCH (c:CONCEPT)
+            RETURN c.concept_name AS concept_name, c.concept_description AS concept_description,
+                   c.section_name AS section_name, c.prerequisites AS prerequisites, c.questions AS questions,
+                   c.embedding AS embedding, c.embedding_updated_at AS embedding_updated_at
+            """)
+        for chapter in chapters:
+            chapter["sections"] = sorted(chapter["sections"], key=lambda s: section_order(s.get("section_no")))
+            for section in chapter["sections"]:
+                section["subsections"] = sorted(section["subsections"],
+                                                key=lambda s: section_order(s.get("sub_section_no")))
+        chapters.sort(key=lambda c: section_order(c.get("chapter_no")))
+        return {"version": self.kb_version(), "chapters": chapters, "concepts": concepts}
+
+    def similar_concepts(self, embedding, top_n: int = 3) -> list:
+        """(name, description) of the `top_n` concepts closest to `embedding`, from the vector index"""
+        results = self.run("vector_query", """CALL db.index.vector.queryNodes('concept-embeddings', $top_n, $query_embedding)
+                            YIELD node, score
+                            RETURN node, score""", top_n=top_n, query_embedding=list(embedding))
+        return [(r['node']['concept_name'], r['node']['concept_description']) for r in results]
+
+
+class InMemoryGraphStore:
+    """
+    The knowledge graph as plain Python data.
+
+    `data` is {"chapters": [{"chapter_name", "chapter_no", "sections": [{"section_name", "section_no",
+    "page_no", "section_content"}]}], "concepts": [{"concept_name", "concept_description",
+    "prerequisites", "questions", "embedding"}]}, the shape written by `synthetic_curriculum`.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.sections = {
+            section["section_name"]: section
+            for chapter in data["chapters"] for section in chapter["sections"]
+        }
+        self.chapters_by_name = {chapter["chapter_name"]: chapter for chapter in data["chapters"]}
+        self.concepts = data.get("concepts", [])
+        # The data never changes under a running store, so a digest of the chapters is a stable version
+        self.version = str(data.get("version") or hashlib.sha1(
+            json.dumps(data["chapters"], sort_keys=True).encode("utf-8")).hexdigest()[:16])
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def kb_version(self) -> str:
+        return self.version
+
+    def export(self) -> dict:
+        return {**self.data, "version": self.version}
+
+    def chapters(self) -> list:
+        return [
+            {
+                "chapter_name": chapter["chapter_name"],
+                "chapter_no": chapter["chapter_no"],
+                "topics": [
+                    {"section_name": s["section_name"], "title": s["section_name"], "content": str(s.get("page_no"))}
+                    for s in chapter["sections"]
+                ],
+            }
+            for chapter in self.data["chapters"]
+        ]
+
+    def chapter(self, chapter_name: str):
+        chapter = self.chapters_by_name.get(chapter_name)
+        if chapter is None:
+            return None
+        return {
+            "chapter_name": chapter["chapter_name"],
+            "chapter_no": chapter["chapter_no"],
+            "topics": [self.describe_section(s) for s in chapter["sections"]],
+        }
+
+    def chapter_manifest(self, chapter_name: str):
+        chapter = self.chapters_by_name.get(chapter_name)
+        if chapter is None:
+            return None
+        topics = [
+            {
+                "section_name": s["section_name"],
+                "title": s["section_name"],
+                "section_no": s.get("section_no"),
+                "page_no": s.get("page_no"),
+                "content_chars": len(s.get("section_content") or ""),
+            }
+            for s in chapter["sections"]
+        ]
+        return {"chapter_name": chapter["chapter_name"], "chapter_no": chapter["chapter_no"],
+                "topics": manifest_topics(topics)}
+
+    def describe_section(self, section: dict) -> dict:
+        return {
+            "section_name": section["section_name"],
+            "title": section["section_name"],
+            "content": section.get("section_content"),
+            "section_no": section.get("section_no"),
+        }
+
+    def topic(self, section_name: str):
+        section = self.sections.get(section_name)
+        return self.describe_section(section) if section else None
+
+    def chapter_names(self) -> list:
+        return [{"chapter_name": c["chapter_name"], "chapter_no": c["chapter_no"]} for c in self.data["chapters"]]
+
+    def concept_rows(self, since: float) -> list:
+        return [
+            (i, c["concept_name"], c["concept_description"], c["embedding"], c.get("embedding_updated_at", 1))
+            for i, c in enumerate(self.concepts)
+            if c.get("embedding") is not None and c.get("embedding_updated_at", 1) > since
+        ]
+
+    def concept_count(self) -> int:
+        return sum(1 for c in self.concepts if c.get("embedding") is not None)
+
+    def prerequisite_rows(self) -> list:
+        return [(c["concept_name"], c["concept_description"], c.get("prerequisites")) for c in self.concepts]
+
+    def question_rows(self) -> list:
+        return [(c["concept_name"], c["questions"]) for c in self.concepts if c.get("questions")]
+
+    def similar_concepts(self, embedding, top_n: int = 3) -> list:
+        rows = [c for c in self.concepts if c.get("embedding") is not None]
+        if not rows:
+            return []
+        matrix = np.asarray([c["embedding"] for c in rows], dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        return [(rows[i]["concept_name"], rows[i]["concept_description"]) for i in np.argsort(-scores)[:top_n]]
+
+
+def synthetic_curriculum(chapters: int = 10, sections: int = 8, concepts_per_section: int = 3,
+                         content_chars: int = 4000, embed=None, seed: int = 0) -> dict:
+    """
+    Generate a curriculum of realistic size for load tests.
+
+    Args:
+        embed (callable, optional): Embedding function for the concept descriptions; concepts get
+            no embedding without one
+    """
+    rng = random.Random(seed)
+    words = ("charge field flux potential current energy force mass wave light lens mirror atom nucleus "
+             "electron magnet circuit resistance capacitor induction").split()
+    data = {"chapters": [], "concepts": []}
+    for c in range(1, chapters + 1):
+        chapter = {"chapter_name": f"Chapter {c}", "chapter_no": c, "sections": []}
+        for s in range(1, sections + 1):
+            text = " ".join(rng.choice(words) for _ in range(content_chars // 7))
+            chapter["sections"].append({
+                "section_name": f"{c}.{s} Section {c}.{s}",
+                "section_no": f"{c}.{s}",
+                "page_no": s * 3,
+                "section_content": text[:content_chars],
+            })
+            for k in range(concepts_per_section):
+                name = f"concept {c}.{s}.{k}"
+                description = " ".join(rng.choice(words) for _ in range(30))
+                previous = data["concepts"][-rng.randint(1, 3)]["concept_name"] if data["concepts"] else None
+                data["concepts"].append({
+                    "concept_name": name,
+                    "concept_description": description,
+                    "prerequisites": previous,
+                    "questions": [f"What is {name}?", f"How does {name} relate to {previous or 'the topic'}?"],
+                    "embedding": list(embed(description)) if embed else None,
+                })
+        data["chapters"].append(chapter)
+    return data
+
+
+@lru_cache(maxsize=None)
+def get_graph_store():
+    """Return the knowledge graph store selected by SOCRATIX_GRAPH_STORE ("neo4j", "memory" or "snapshot")"""
+    if config.GRAPH_STORE == "memory":
+        if config.GRAPH_STORE_PATH:
+            return InMemoryGraphStore.from_file(config.GRAPH_STORE_PATH)
+        from fake_llm import fake_embedding
+        return InMemoryGraphStore(synthetic_curriculum(embed=fake_embedding))
+    if config.GRAPH_STORE == "snapshot":
+        from snapshot import SnapshotGraphStore
+        return SnapshotGraphStore(config.GRAPH_STORE_PATH)
+    return Neo4jGraphStore()
@@ -0,0 +1,125 @@
+"""Token-budgeted conversation history for the chatbot prompt."""
+import json
+from functools import lru_cache
+
+import tiktoken
+from langgraph.constants import TAG_NOSTREAM
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+
+import config
+from llm_clients import get_chat_model
+from prompts import HISTORY_SUMMARY_PROMPT
+
+TOOL_OUTPUT_STUB = "[tool output omitted]"
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """Return the tokenizer of the chat model, or None when it cannot be loaded (eg. offline)"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(config.CHAT_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Could not load tokenizer, estimating token counts: {str(e)}")
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def count_tokens(message) -> int:
+    """Approximate the prompt tokens of one message, tool call arguments included"""
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = count_text_tokens(text) + 4
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += count_text_tokens(tool_call["name"] + json.dumps(tool_call["args"]))
+    return tokens
+
+
+def split_turns(messages: list) -> list:
+    """Group messages into turns, each starting with the topic and student message it was sent with"""
+    turns = []
+    pending = []
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            pending.append(message)
+            continue
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].extend(pending)
+        turns[-1].append(message)
+        pending = []
+    if pending:
+        turns.append(pending)
+    return turns
+
+
+def latest_topic(messages: list) -> str:
+    """The topic is sent as a system message with every student message; return the newest one"""
+    for message in reversed(messages):
+        if isinstance(message, SystemMessage):
+            return message.content
+    return ""
+
+
+def summarize(summary: str, messages: list) -> str:
+    """Fold `messages` into the running conversation summary"""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"student: {message.content}")
+        elif isinstance(message, AIMessage) and message.content:
+            lines.append(f"teacher: {message.content}")
+    if not lines:
+        return summary
+    prompt = HISTORY_SUMMARY_PROMPT.format(summary=summary or "(empty)", conversation="\n".join(lines))
+    # Summaries are internal bookkeeping, keep them out of the streamed answer tokens
+    return get_chat_model().invoke(prompt, config={"tags": [TAG_NOSTREAM]}).content
+
+
+def fit_history(messages: list, summary: str = "", budget: int = None, keep_turns: int = None):
+    """
+    Bound the conversation history sent to the chatbot.
+
+    The newest `keep_turns` turns are kept verbatim. Tool outputs of older turns are replaced
+    by a stub. If the history is still over `budget` tokens, the oldest turns are folded into
+    the running summary until it fits in half the budget, so summarization is not needed again
+    on the next turn.
+
+    Returns:
+        tuple: (history for the prompt, updated summary, state updates removing the folded messages)
+    """
+    budget = budget or config.HISTORY_TOKEN_BUDGET
+    keep_turns = max(1, keep_turns or config.HISTORY_KEEP_TURNS)
+
+    turns = split_turns(messages)
+    history = []
+    for i, turn in enumerate(turns):
+        recent = i >= len(turns) - keep_turns
+        history.append([
+            message
+            if recent or not isinstance(message, ToolMessage)
+            else message.model_copy(update={"content": TOOL_OUTPUT_STUB})
+            for message in turn
+            if not isinstance(message, SystemMessage)
+        ])
+
+    turn_tokens = [sum(count_tokens(message) for message in turn) for turn in history]
+    removals = []
+    if sum(turn_tokens) > budget:
+        folded = []
+        while len(history) > keep_turns and sum(turn_tokens) > budget // 2:
+            history.pop(0)
+            turn_tokens.pop(0)
+            folded_turn = turns.pop(0)
+            folded.extend(folded_turn)
+            removals.extend(RemoveMessage(id=message.id) for message in folded_turn)
+        summary = summarize(summary, folded)
+
+    return [message for turn in history for message in turn], summary, removals
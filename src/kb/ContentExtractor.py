@@ -3,11 +3,19 @@
 
 import google.generativeai as genai
 import os
+import sys
 from langchain_core.output_parsers import JsonOutputParser
 import neo4j
 import time
 import argparse
 
+# Share the server's LLM scheduler (src/ is the parent of this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_scheduler import get_scheduler, llm_session
+from llm_cassette import get_cassette
+
+GEMINI_MODEL = 'gemini-2.0-flash-exp'
+
 def load_neo4j_config(config_file="../neo4j.txt"):
     """Load Neo4j credentials from config file"""
     config = {}
@@ -20,11 +28,14 @@ def load_neo4j_config(config_file="../neo4j.txt"):
 def initialize_gemini():
     """Initialize Gemini AI model"""
     #os.environ["API_KEY"] = api_key
-    if os.environ.get("GEMINI_API_KEY") is None:
-        raise Exception("Please set the GEMINI_API_KEY environment variable")
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if api_key is None:
+        if get_cassette().mode != "replay":
+            raise Exception("Please set the GEMINI_API_KEY environment variable")
+        api_key = "replay"
     
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-    return genai.GenerativeModel(model_name='gemini-2.0-flash-exp')
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name=GEMINI_MODEL)
 
 def execute_query(query, uri, username, password):
     """Execute Neo4j query"""
@@ -35,7 +46,6 @@ def execute_query(query, uri, username, password):
 
 def extract_content_from_pdf(section_name, model, pdf_path="leph102.pdf"):
     """Extract content from PDF for given section"""
-    sample_pdf = genai.upload_file(pdf_path)
     prompt = """From the given pdf, extract and print the content of the section given.
     Extract the full content of the section even if it spans multiple pages.
     Extract all the content till the next section starts.
@@ -48,9 +58,19 @@ def extract_content_from_pdf(section_name, model, pdf_path="leph102.pdf"):
     """
     
     prompt = prompt.format(section_name=section_name)
-    response = model.generate_content([prompt, sample_pdf], request_options={"timeout": 1000})
-    print(response.text)
-    return response.text
+
+    def generate():
+        sample_pdf = genai.upload_file(pdf_path)
+        # The scheduler paces requests to the model's rate limit and retries when the quota is exhausted
+        return get_scheduler().call(
+            lambda: model.generate_content([prompt, sample_pdf], request_options={"timeout": 1000}).text,
+            GEMINI_MODEL
+        )
+
+    # Recorded per prompt and PDF file, so the pipeline can be replayed without a Gemini key
+    text = get_cassette().call(GEMINI_MODEL, {"prompt": prompt, "pdf": os.path.basename(pdf_path)}, generate)
+    print(text)
+    return text
 
 def clean_property_value(value):
     """Clean property value by removing/escaping quotes"""
@@ -92,9 +112,8 @@ def update_sections_with_content(model, neo4j_config, pdf_path="leph102.pdf"):
     for chapter_name, section_name in chapter_sections:
         try:
             print(f"\nProcessing chapter: {chapter_name}, section: {section_name}")
-            section_content = extract_content_from_pdf(section_name, model, pdf_path)
-            time.sleep(30)
-            print("Sleep completed!")
+            with llm_session("ingestion"):
+                section_content = extract_content_from_pdf(section_name, model, pdf_path)
             
             cleaned_content = clean_property_value(str(section_content))
             
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from langchain_core.pydantic_v1 import BaseModel, Field
+import neo4j
+import argparse
+import os
+import sys
+
+# Share the server's LLM scheduler and clients (src/ is the parent of this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_clients import get_chat_model
+
+QUESTION_BANK_PROMPT = """
+You are a query creator. You are to create questions that check whether a student understands the concept given below.
+The questions should be such that they are easy to understand and answer.
+Start with the simplest question and make each next question go a little deeper.
+The questions should be such that they are related to the concept and its description. DO NOT Hallucinate.
+
+concept: {concept_name}
+description: {concept_description}
+number of questions: {count}
+"""
+
+# Model classes
+class Queries(BaseModel):
+    questions: list[str] = Field(description="Questions to be asked to the student")
+
+def get_neo4j_credentials():
+    """Read Neo4j credentials from config file"""
+    credentials = {}
+    with open('../neo4j.txt', 'r') as f:
+        for line in f:
+            key, value = line.strip().split('=')
+            credentials[key] = value
+    return credentials
+
+def get_neo4j_driver():
+    """Create and return Neo4j driver using credentials"""
+    print("Initializing Neo4j connection...")
+    credentials = get_neo4j_credentials()
+    driver = neo4j.GraphDatabase.driver(
+        credentials['NEO4J_URI'],
+        auth=neo4j.basic_auth(credentials['NEO4J_USERNAME'], credentials['NEO4J_PASSWORD'])
+    )
+    print("✓ Neo4j connection established")
+    return driver
+
+def fetch_concepts(driver, force=False):
+    """Fetch the concepts that still need a question bank (all of them when force is set)"""
+    query = """
+    MATCH (c:CONCEPT)
+    WHERE $force OR c.questions IS NULL
+    RETURN DISTINCT c.concept_name AS concept_name, c.concept_description AS concept_description
+    """
+    with driver.session() as session:
+        return session.run(query, force=force).data()
+
+def create_question_bank(concept, count):
+    """Generate questions for one concept using LLM"""
+    prompt = QUESTION_BANK_PROMPT.format(
+        concept_name=concept['concept_name'],
+        concept_description=concept['concept_description'],
+        count=count
+    )
+    model = get_chat_model("gpt-4o-mini")
+    structured_llm = model.with_structured_output(Queries)
+    return structured_llm.invoke(prompt).questions
+
+def store_question_bank(driver, concept_name, questions):
+    """Store the questions on every CONCEPT node with this name"""
+    query = """
+    MATCH (c:CONCEPT {concept_name: $concept_name})
+    SET c.questions = $questions, c.questions_updated_at = timestamp()
+    """
+    with driver.session() as session:
+        session.run(query, concept_name=concept_name, questions=questions)
+
+def main(count=3, force=False):
+    """Create a question bank for every concept in the knowledge graph"""
+    print("\n=== Starting Question Bank Creation ===\n")
+    driver = get_neo4j_driver()
+    try:
+        concepts = fetch_concepts(driver, force)
+        print(f"✓ Found {len(concepts)} concepts to process")
+
+        for i, concept in enumerate(concepts):
+            print(f"\nProcessing concept {i+1}/{len(concepts)}: {concept['concept_name']}")
+            try:
+                questions = create_question_bank(concept, count)
+                store_question_bank(driver, concept['concept_name'], questions)
+                print(f"✓ Stored {len(questions)} questions")
+            except Exception as e:
+                print(f"❌ Error creating questions for {concept['concept_name']}: {str(e)}")
+
+        print("\n✓ Question bank creation completed successfully")
+    finally:
+        driver.close()
+        print("\n✓ Neo4j connection closed")
+    print("\n=== Process Complete ===")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create a question bank for every concept in Neo4j')
+    parser.add_argument('--count', type=int, default=3, help='Number of questions per concept')
+    parser.add_argument('--force', action='store_true', help='Regenerate questions for concepts that already have them')
+
+    args = parser.parse_args()
+    main(args.count, args.force)
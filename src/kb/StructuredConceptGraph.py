@@ -6,8 +6,13 @@ from langchain_core.output_parsers import JsonOutputParser
 from openai import OpenAI
 from langchain_core.pydantic_v1 import BaseModel, Field 
 from typing import Optional
-from langchain_openai import ChatOpenAI
 import neo4j
+import os
+import sys
+
+# Share the server's LLM scheduler and clients (src/ is the parent of this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_clients import get_chat_model
 
 # Model classes
 class ConceptName(BaseModel):
@@ -55,7 +60,7 @@ def execute_query(query):
 
 def get_llm():
     """Initialize and return LLM"""
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini")
     return llm
 
 def extract_concept_graph(content):
@@ -69,7 +74,7 @@ def extract_concept_graph(content):
                   
                   topic: {content}
                   """
-        model = ChatOpenAI(model="gpt-4o", temperature=0)
+        model = get_chat_model("gpt-4o")
         structured_llm = model.with_structured_output(ConceptGraph)
         response = structured_llm.invoke(prompt)
         print("✓ Concept extraction completed")
@@ -7,22 +7,32 @@ import os
 #import getpass
 from langchain_core.output_parsers import JsonOutputParser
 import neo4j
+import sys
+
+# Share the server's LLM scheduler and cassettes (src/ is the parent of this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_scheduler import get_scheduler
+from llm_cassette import get_cassette
+
+GEMINI_MODEL = 'gemini-1.5-pro'
 
 
 def initialize_gemini():
     """Initialize Gemini AI model"""
     #os.environ["API_KEY"] = api_key
-    if os.environ.get("GEMINI_API_KEY") is None:
-        raise Exception("Please set the GEMINI_API_KEY environment variable")
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if api_key is None:
+        if get_cassette().mode != "replay":
+            raise Exception("Please set the GEMINI_API_KEY environment variable")
+        api_key = "replay"
     
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-    return genai.GenerativeModel(model_name='gemini-1.5-pro')
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name=GEMINI_MODEL)
 
 
 def extract_toc_from_pdf(model, pdf_path):
     """Extract table of contents from PDF using Gemini"""
-    sample_pdf = genai.upload_file(pdf_path)
-    response = model.generate_content(["""Prepare table of contents for the given file with the page numbers given at the bottom.Include sub sections as well.
+    prompt = """Prepare table of contents for the given file with the page numbers given at the bottom.Include sub sections as well.
 Format should be json.
 For eg:
 ```
@@ -70,8 +80,14 @@ For eg:
 ]
 ```
 Do not hallucinate.
-""", sample_pdf])
-    return response.text
+"""
+
+    def generate():
+        sample_pdf = genai.upload_file(pdf_path)
+        return get_scheduler().call(lambda: model.generate_content([prompt, sample_pdf]).text, GEMINI_MODEL)
+
+    # Recorded per PDF file, so the pipeline can be replayed without a Gemini key
+    return get_cassette().call(GEMINI_MODEL, {"prompt": prompt, "pdf": os.path.basename(pdf_path)}, generate)
 
 def parse_toc_json(response_text):
     """Parse TOC JSON and add subject information"""
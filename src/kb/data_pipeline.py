@@ -3,6 +3,9 @@ import subprocess
 import sys
 import time
 import os
+import uuid
+
+import neo4j
 
 def run_script(script_name, *args):
     """Run a Python script with arguments and handle its output"""
@@ -43,41 +46,85 @@ def run_script(script_name, *args):
         print(f"\n❌ Error running {script_name}: {str(e)}")
         return False
 
-def main(pdf_path):
+def get_neo4j_credentials():
+    """Read Neo4j credentials from config file"""
+    credentials = {}
+    with open('../neo4j.txt', 'r') as f:
+        for line in f:
+            key, value = line.strip().split('=')
+            credentials[key] = value
+    return credentials
+
+def stamp_kb_version():
     """
-    Main pipeline to process PDF and create knowledge graph
-    
-    Args:
-        pdf_path: Path to the PDF file to process
+    Write a new knowledge-base version stamp, so the API drops its cached curriculum.
+
+    Run `python data_pipeline.py --stamp` after changing the graph by other means than this pipeline.
     """
-    start_time = time.time()
-    
-    print("\n📚 Starting PDF Processing Pipeline")
-    print(f"Input PDF: {pdf_path}")
-    
-    
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    credentials = get_neo4j_credentials()
+    with neo4j.GraphDatabase.driver(
+        credentials['NEO4J_URI'],
+        auth=neo4j.basic_auth(credentials['NEO4J_USERNAME'], credentials['NEO4J_PASSWORD'])
+    ) as driver:
+        with driver.session() as session:
+            session.run("""
+                MERGE (v:KB_VERSION)
+                SET v.version = $version, v.updated_at = datetime()
+                """, version=version)
+    print(f"🏷️  Knowledge base version: {version}")
+    return version
+
+def run_steps(pdf_path):
+    """Run the five pipeline steps, stopping at the first one that fails"""
     # Step 1: Extract Table of Contents
-    print("\n📑 Step 1/4: Extracting Table of Contents")
+    print("\n📑 Step 1/5: Extracting Table of Contents")
     if not run_script("TOCExtractor.py", pdf_path):
         print("❌ Pipeline failed at TOC extraction step")
-        return
+        return False
     
     # Step 2: Extract Content
-    print("\n📝 Step 2/4: Extracting Content")
+    print("\n📝 Step 2/5: Extracting Content")
     if not run_script("ContentExtractor.py", pdf_path):
         print("❌ Pipeline failed at content extraction step")
-        return
+        return False
     
     # Step 3: Create Structured Concept Graph
-    print("\n🔄 Step 3/4: Creating Structured Concept Graph")
+    print("\n🔄 Step 3/5: Creating Structured Concept Graph")
     if not run_script("StructuredConceptGraph.py"):
         print("❌ Pipeline failed at concept graph creation step")
-        return
+        return False
     
     # Step 4: Create Vector Index
-    print("\n📊 Step 4/4: Creating Vector Index")
+    print("\n📊 Step 4/5: Creating Vector Index")
     if not run_script("vectorIndexCreation.py"):
         print("❌ Pipeline failed at vector index creation step")
+        return False
+    
+    # Step 5: Create Question Bank
+    print("\n❓ Step 5/5: Creating Question Bank")
+    if not run_script("QuestionBankCreator.py"):
+        print("❌ Pipeline failed at question bank creation step")
+        return False
+    
+    return True
+
+def main(pdf_path):
+    """
+    Main pipeline to process PDF and create knowledge graph
+    
+    Args:
+        pdf_path: Path to the PDF file to process
+    """
+    start_time = time.time()
+    
+    print("\n📚 Starting PDF Processing Pipeline")
+    print(f"Input PDF: {pdf_path}")
+    
+    completed = run_steps(pdf_path)
+    # Even a failed run may have changed the graph, so the API's cached curriculum is stale either way
+    stamp_kb_version()
+    if not completed:
         return
     
     # Calculate total execution time
@@ -89,8 +136,13 @@ def main(pdf_path):
     print(f"⏱️  Total execution time: {minutes} minutes and {seconds} seconds")
 
 if __name__ == "__main__":
+    if sys.argv[1:] == ["--stamp"]:
+        stamp_kb_version()
+        sys.exit(0)
+
     if len(sys.argv) != 2:
         print("Usage: python data_pipeline.py <pdf_path>")
+        print("       python data_pipeline.py --stamp")
         sys.exit(1)
         
     pdf_path = sys.argv[1]
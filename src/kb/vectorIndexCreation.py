@@ -7,8 +7,13 @@ from sklearn.metrics.pairwise import cosine_similarity
 from neo4j import GraphDatabase
 from openai import OpenAI
 import os
+import sys
 import configparser
 
+# Share the server's LLM scheduler and clients (src/ is the parent of this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_clients import get_openai_client
+
 def load_neo4j_config(config_file):
     """Load Neo4j configuration from file"""
     print("Loading Neo4j configuration...")
@@ -27,7 +32,7 @@ def init_neo4j_driver(uri, username, password):
 def init_openai_client():
     """Initialize OpenAI client"""
     print("Initializing OpenAI client...")
-    return OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+    return get_openai_client()
 
 def generate_openai_embedding(client, text):
     """Generate embeddings using OpenAI API"""
@@ -53,6 +58,7 @@ def store_embeddings_in_neo4j(driver, openai_client):
             session.run("""
                 MATCH (c:CONCEPT {concept_name: $name})
                 CALL db.create.setNodeVectorProperty(c, 'embedding', $embedding)
+                SET c.embedding_updated_at = timestamp()
                 """, name=name, embedding=embedding)
             
     print("Successfully stored all embeddings in Neo4j!")
@@ -0,0 +1,164 @@
+"""Record/replay for model calls, so the agent and the pipeline can run without provider keys."""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from functools import lru_cache
+
+import httpx
+
+import config
+
+
+class CassetteMiss(Exception):
+    """Replay mode was asked for a call that was never recorded"""
+
+
+def request_key(*parts) -> str:
+    """Stable key of a call: the hash of its canonical JSON"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    A directory of recorded calls, one JSON file per distinct request.
+
+    Modes: "live" passes calls through, "record" makes the call and saves its result,
+    "replay" serves saved results only. Replayed calls take `latency` seconds, or as long
+    as the recorded call took when `latency` is None.
+    """
+
+    def __init__(self, path: str, mode: str = "live", latency: float = None):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.stats = {"recorded": 0, "replayed": 0, "missed": 0}
+
+    @property
+    def active(self) -> bool:
+        return self.mode in ("record", "replay")
+
+    def file_for(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def load(self, key: str) -> dict:
+        try:
+            with open(self.file_for(key), "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.stats["missed"] += 1
+            raise CassetteMiss(f"No recording {key} in {self.path}; run once with SOCRATIX_LLM_MODE=record")
+        self.stats["replayed"] += 1
+        return entry
+
+    def save(self, key: str, entry: dict):
+        os.makedirs(self.path, exist_ok=True)
+        # Write then rename, so a concurrent replay never sees half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f, indent=1)
+        os.replace(tmp_path, self.file_for(key))
+        self.stats["recorded"] += 1
+
+    def replay_delay(self, entry: dict) -> float:
+        return entry.get("elapsed", 0.0) if self.latency is None else self.latency
+
+    def call(self, name: str, request: dict, fn):
+        """
+        Run `fn` (returning JSON-serializable data) through the cassette.
+
+        Args:
+            name (str): What is being called, eg. the model name
+            request (dict): Everything the result depends on
+            fn (callable): Makes the live call
+        """
+        if not self.active:
+            return fn()
+        key = request_key(name, request)
+        if self.mode == "replay":
+            entry = self.load(key)
+            time.sleep(self.replay_delay(entry))
+            return entry["result"]
+        started = time.perf_counter()
+        result = fn()
+        self.save(key, {"name": name, "request": request, "result": result,
+                        "elapsed": round(time.perf_counter() - started, 3)})
+        return result
+
+
+class ReplayStream(httpx.SyncByteStream):
+    """Serves a recorded server-sent event stream event by event, spreading the delay over the events"""
+
+    def __init__(self, body: bytes, delay: float):
+        self.events = [event + b"\n\n" for event in body.split(b"\n\n") if event]
+        self.delay = delay / max(len(self.events), 1)
+
+    def __iter__(self):
+        for event in self.events:
+            time.sleep(self.delay)
+            yield event
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records provider responses to a cassette or replays them from it"""
+
+    def __init__(self, transport: httpx.BaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    def key(self, request: httpx.Request) -> str:
+        try:
+            body = json.loads(request.content) if request.content else None
+        except ValueError:
+            body = request.content.decode("utf-8", "replace")
+        return request_key(request.method, request.url.path, body)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = self.key(request)
+        if self.cassette.mode == "replay":
+            try:
+                entry = self.cassette.load(key)
+            except CassetteMiss as e:
+                # Answered like a provider error, so the client fails at once instead of retrying
+                return httpx.Response(404, json={"error": {"message": str(e), "type": "cassette_miss"}})
+            body = entry["body"].encode("utf-8")
+            headers = {"content-type": entry["content_type"]}
+            delay = self.cassette.replay_delay(entry)
+            if entry["content_type"].startswith("text/event-stream"):
+                return httpx.Response(entry["status"], headers=headers, stream=ReplayStream(body, delay))
+            time.sleep(delay)
+            return httpx.Response(entry["status"], headers=headers, content=body)
+
+        started = time.perf_counter()
+        response = self.transport.handle_request(request)
+        # Streams are read to the end before the client sees them while recording
+        body = response.read()
+        response.close()
+        content_type = response.headers.get("content-type", "application/json")
+        if response.status_code < 400:
+            self.cassette.save(key, {
+                "request": {"method": request.method, "path": request.url.path},
+                "status": response.status_code,
+                "content_type": content_type,
+                "body": body.decode("utf-8"),
+                "elapsed": round(time.perf_counter() - started, 3),
+            })
+        return httpx.Response(response.status_code, headers={"content-type": content_type}, content=body)
+
+    def close(self):
+        self.transport.close()
+
+
+@lru_cache(maxsize=None)
+def get_cassette() -> Cassette:
+    """Return the cassette selected by SOCRATIX_LLM_MODE"""
+    return Cassette(config.LLM_CASSETTE_DIR, config.LLM_MODE, config.LLM_REPLAY_LATENCY)
+
+
+def placeholder_api_key(name: str):
+    """A dummy key when replaying or faking without one, so provider clients can still be constructed"""
+    if config.LLM_MODE in ("replay", "fake") and not os.getenv(name):
+        return "replay"
+    return None
@@ -0,0 +1,53 @@
+"""Process-wide LLM clients that share one pooled, keep-alive HTTP connection pool."""
+from functools import lru_cache
+
+import httpx
+from langchain_openai import ChatOpenAI
+from openai import OpenAI
+
+import config
+from llm_scheduler import SchedulingTransport, get_scheduler
+from llm_cassette import CassetteTransport, get_cassette, placeholder_api_key
+from tracing import get_tracing_handler
+
+
+@lru_cache(maxsize=None)
+def get_http_client():
+    """Return the shared httpx client used by every OpenAI call in this process"""
+    limits = httpx.Limits(
+        max_connections=config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_MAX_KEEPALIVE,
+        keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.HTTPTransport(limits=limits)
+    if config.LLM_MODE == "fake":
+        from fake_llm import FakeOpenAITransport
+        transport = FakeOpenAITransport()
+    elif get_cassette().active:
+        transport = CassetteTransport(transport, get_cassette())
+    # Every model request waits for the scheduler, which also retries 429s
+    transport = SchedulingTransport(transport, get_scheduler())
+    return httpx.Client(transport=transport, timeout=config.LLM_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(model=config.CHAT_MODEL, temperature=0):
+    """Return a shared chat model for the given model name and temperature"""
+    # stream_usage makes streamed replies report their token counts too; the scheduler retries 429s
+    return ChatOpenAI(model=model, temperature=temperature, http_client=get_http_client(), max_retries=0,
+                      api_key=placeholder_api_key("OPENAI_API_KEY"), stream_usage=True,
+                      callbacks=[get_tracing_handler()])
+
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """Return the shared OpenAI client (used for embeddings)"""
+    return OpenAI(http_client=get_http_client(), max_retries=0, api_key=placeholder_api_key("OPENAI_API_KEY"))
+
+
+def preconnect():
+    """Open a pooled connection to the OpenAI API so the first real call skips the TLS handshake"""
+    try:
+        get_openai_client().models.list()
+    except Exception as e:
+        print(f"LLM preconnect failed: {str(e)}")
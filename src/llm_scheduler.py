@@ -0,0 +1,357 @@
+"""Process-wide scheduler for LLM requests: per-model rate limits, fair queuing across sessions and 429 retries."""
+import contextvars
+import inspect
+import json
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+
+import httpx
+
+import config
+
+# Session the current request is made for; LLM calls made outside a chat turn share one queue
+current_session = contextvars.ContextVar("llm_session", default="background")
+
+
+@contextmanager
+def llm_session(session_id: str):
+    """Attribute the LLM calls made inside the block to a student session"""
+    token = current_session.set(str(session_id))
+    try:
+        yield
+    finally:
+        current_session.reset(token)
+
+
+def per_session(func):
+    """Run `func` (a function or generator with a `session_id` argument) inside `llm_session`"""
+    signature = inspect.signature(func)
+
+    def session_of(args, kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return bound.arguments["session_id"]
+
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            with llm_session(session_of(args, kwargs)):
+                yield from func(*args, **kwargs)
+        return generator_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with llm_session(session_of(args, kwargs)):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class TokenBucket:
+    """Refills `per_minute` units a minute up to one minute's worth; the balance may go negative"""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if it can be taken now)"""
+        self.refill(now)
+        # Requests larger than the whole bucket go through once it is full
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate) if self.rate > 0 else 0.0
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class ModelLane:
+    """Rate limits and the per-session waiting queues of one model"""
+
+    def __init__(self, model: str, requests_per_minute: int, tokens_per_minute: int):
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # session -> waiting tickets; sessions are served round-robin in this order
+        self.sessions = OrderedDict()
+        self.paused_until = 0.0
+        self.stats = {"granted": 0, "waited": 0, "wait_seconds": 0.0, "max_waiting": 0,
+                      "rate_limited": 0, "retries": 0, "tokens_used": 0}
+
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self.sessions.values())
+
+    def enqueue(self, session: str, ticket):
+        self.sessions.setdefault(session, deque()).append(ticket)
+        self.stats["max_waiting"] = max(self.stats["max_waiting"], self.waiting())
+
+    def next_ticket(self):
+        if not self.sessions:
+            return None
+        return self.sessions[next(iter(self.sessions))][0]
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def grant(self, session: str, tokens: int):
+        """Let the session's oldest request through and move the session to the back of the line"""
+        queue = self.sessions.pop(session)
+        queue.popleft()
+        if queue:
+            self.sessions[session] = queue
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.stats["granted"] += 1
+
+
+class RateLimited(Exception):
+    """A 429 from the provider, raised by the scheduling transport so the scheduler can retry it"""
+    status_code = 429
+
+    def __init__(self, request: httpx.Request, response: httpx.Response):
+        super().__init__(f"rate limited by {request.url.host}")
+        self.response = response
+        self.retry_after = retry_after_seconds(response.headers)
+
+
+def retry_after_seconds(headers) -> float:
+    value = headers.get("retry-after-ms")
+    if value:
+        return float(value) / 1000
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    # openai.RateLimitError has status_code, google's ResourceExhausted has code
+    return getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+
+class LLMScheduler:
+    """
+    Admits LLM requests under per-model request and token budgets.
+
+    Waiting requests of one model are served one session at a time in round-robin order,
+    so a student sending many requests only delays their own queue. A 429 pauses the
+    model's lane for the backoff delay and the request is retried.
+
+    The budgets are the provider's, shared by `workers` API processes: each process admits its
+    equal share of them.
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None, limits: dict = None,
+                 max_retries: int = None, backoff_base: float = None, backoff_max: float = None,
+                 workers: int = None):
+        self.requests_per_minute = requests_per_minute or config.LLM_REQUESTS_PER_MINUTE
+        self.tokens_per_minute = tokens_per_minute or config.LLM_TOKENS_PER_MINUTE
+        self.limits = config.LLM_RATE_LIMITS if limits is None else limits
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or config.LLM_BACKOFF_BASE
+        self.backoff_max = backoff_max or config.LLM_BACKOFF_MAX
+        self.workers = max(1, workers or config.WORKERS)
+        self.lanes = {}
+        self.condition = threading.Condition()
+
+    def lane(self, model: str) -> ModelLane:
+        if model not in self.lanes:
+            limits = self.limits.get(model, {})
+            self.lanes[model] = ModelLane(model, max(1, limits.get("rpm", self.requests_per_minute) // self.workers),
+                                          max(1, limits.get("tpm", self.tokens_per_minute) // self.workers))
+        return self.lanes[model]
+
+    def acquire(self, model: str, tokens: int = 0, session: str = None):
+        """Block until a request of `tokens` estimated tokens may be sent to `model`"""
+        session = session or current_session.get()
+        ticket = object()
+        started = time.monotonic()
+        with self.condition:
+            lane = self.lane(model)
+            lane.enqueue(session, ticket)
+            while True:
+                timeout = None
+                if lane.next_ticket() is ticket:
+                    timeout = lane.wait_time(tokens, time.monotonic())
+                    if timeout <= 0:
+                        lane.grant(session, tokens)
+                        break
+                # Woken up early whenever a request is granted, so the next session can take its turn
+                self.condition.wait(timeout)
+            self.condition.notify_all()
+            waited = time.monotonic() - started
+            if waited > 0.01:
+                lane.stats["waited"] += 1
+                lane.stats["wait_seconds"] += waited
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def settle(self, model: str, charged: int, used: int):
+        """Refund (or charge more of) the tokens taken for a request once its actual usage is known"""
+        with self.condition:
+            lane = self.lane(model)
+            lane.tokens.level = min(lane.tokens.capacity, lane.tokens.level + charged - used)
+            lane.stats["tokens_used"] += used
+            self.condition.notify_all()
+
+    def rate_limited(self, model: str, delay: float):
+        with self.condition:
+            lane = self.lane(model)
+            lane.stats["rate_limited"] += 1
+            lane.paused_until = max(lane.paused_until, time.monotonic() + delay)
+
+    def call(self, fn, model: str, tokens: int = 0, session: str = None):
+        """Run `fn` once the scheduler admits it, retrying with backoff when it is rate limited"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(model, tokens, session)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limit_error(e):
+                    raise
+                delay = self.backoff(attempt, getattr(e, "retry_after", None))
+                print(f"{model} rate limited, retrying in {delay:.1f}s")
+                self.rate_limited(model, delay)
+                with self.condition:
+                    self.lane(model).stats["retries"] += 1
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        """Queue depth and throttling counters per model"""
+        with self.condition:
+            return {
+                model: {**lane.stats, "wait_seconds": round(lane.stats["wait_seconds"], 3),
+                        "waiting": lane.waiting(), "sessions_waiting": len(lane.sessions)}
+                for model, lane in self.lanes.items()
+            }
+
+
+def estimate_tokens(value) -> int:
+    """Rough token count of the text in a message list, prompt or embedding input (4 characters a token)"""
+    if isinstance(value, str):
+        return len(value) // 4 + 1
+    if isinstance(value, list):
+        return sum(estimate_tokens(item) for item in value)
+    if isinstance(value, dict):
+        # Message text, content parts and tool call arguments; not the keys or roles
+        return sum(estimate_tokens(value.get(key)) for key in ("content", "text", "arguments", "function", "tool_calls"))
+    return 0
+
+
+def describe_request(request: httpx.Request):
+    """
+    The model a provider request is for and the tokens to charge for it up front:
+    its estimated prompt plus `max_tokens` (or SOCRATIX_LLM_COMPLETION_TOKENS) for the completion.
+    """
+    if request.method != "POST":
+        return None, 0
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return None, 0
+    if not isinstance(body, dict):
+        return None, 0
+    if "input" in body:  # embeddings have no completion
+        return body.get("model"), estimate_tokens(body["input"])
+    prompt = estimate_tokens(body.get("messages") or body.get("prompt") or [])
+    completion = body.get("max_completion_tokens") or body.get("max_tokens") or config.LLM_COMPLETION_TOKENS
+    return body.get("model"), prompt + completion
+
+
+def usage_tokens(data: bytes):
+    """total_tokens of the last "usage" object in a JSON or event-stream body, or None"""
+    start = data.rfind(b'"usage"')
+    if start == -1:
+        return None
+    try:
+        text = data[start:].decode("utf-8", "ignore")
+        usage, _ = json.JSONDecoder().raw_decode(text[text.index(":") + 1:].lstrip())
+        return int(usage["total_tokens"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class UsageStream(httpx.SyncByteStream):
+    """Passes a response body through and reports its token usage once the body has been read"""
+
+    TAIL = 8192  # the usage comes last, in the body's final chunk or event
+
+    def __init__(self, stream: httpx.SyncByteStream, on_usage):
+        self.stream = stream
+        self.on_usage = on_usage
+        self.tail = b""
+
+    def __iter__(self):
+        for chunk in self.stream:
+            self.tail = (self.tail + chunk)[-self.TAIL:]
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+        if self.on_usage:
+            self.on_usage(usage_tokens(self.tail))
+            self.on_usage = None
+
+
+class SchedulingTransport(httpx.BaseTransport):
+    """
+    httpx transport that sends every model request through the scheduler.
+
+    Each request is charged its estimated tokens before it is sent; the charge is settled against
+    the usage the response reports, and refunded when the provider rate limits the request.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, scheduler: LLMScheduler):
+        self.transport = transport
+        self.scheduler = scheduler
+
+    def send(self, request: httpx.Request, model: str, tokens: int) -> httpx.Response:
+        response = self.transport.handle_request(request)
+        if response.status_code == 429:
+            response.read()
+            response.close()
+            self.scheduler.settle(model, tokens, 0)
+            raise RateLimited(request, response)
+
+        def on_usage(used):
+            if used is not None:
+                self.scheduler.settle(model, tokens, used)
+
+        try:
+            # Fake and replayed responses arrive with their body already read
+            on_usage(usage_tokens(response.content[-UsageStream.TAIL:]))
+        except httpx.ResponseNotRead:
+            response.stream = UsageStream(response.stream, on_usage)
+        return response
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = describe_request(request)
+        if model is None:
+            return self.transport.handle_request(request)
+        try:
+            return self.scheduler.call(lambda: self.send(request, model, tokens), model, tokens)
+        except RateLimited as e:
+            # Out of retries: hand the 429 to the client so it raises its usual error
+            return e.response
+
+    def close(self):
+        self.transport.close()
+
+
+@lru_cache(maxsize=None)
+def get_scheduler() -> LLMScheduler:
+    """Return the process-wide LLM scheduler"""
+    return LLMScheduler()
@@ -0,0 +1,202 @@
+"""
+Load generator for the API: simulated students browse chapters and topics and chat with the teacher.
+
+By default the API runs in this process against the in-memory knowledge graph and the fake LLM,
+so no Neo4j or provider keys are needed:
+
+    python loadtest.py --students 20 --duration 60 --llm-latency 0.8
+
+Use --url to drive a running server instead. Reports throughput, latency percentiles and error
+rates per endpoint.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+import numpy as np
+import requests
+
+QUESTIONS = [
+    "Can you explain this topic in simple words?",
+    "Why does this happen?",
+    "What are the prerequisites for this?",
+    "Can you give me a question to test myself?",
+    "How is this used in real life?",
+    "I did not understand the last part, can you explain again?",
+]
+
+
+class LoadStats:
+    """Latency and outcome of every request, per endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint: str, latency: float, ok: bool):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> dict:
+        with self.lock:
+            endpoints = {}
+            for endpoint, values in sorted(self.latencies.items()):
+                ms = np.asarray(values) * 1000
+                endpoints[endpoint] = {
+                    "requests": len(values),
+                    "throughput_rps": round(len(values) / elapsed, 2),
+                    "error_rate": round(self.errors[endpoint] / len(values), 4),
+                    **{f"p{p}_ms": round(float(np.percentile(ms, p)), 1) for p in (50, 95, 99)},
+                    "max_ms": round(float(ms.max()), 1),
+                }
+            total = sum(len(values) for values in self.latencies.values())
+            errors = sum(self.errors.values())
+        return {
+            "elapsed_s": round(elapsed, 1),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+class Student(threading.Thread):
+    """One simulated student: picks a chapter, reads topics and asks the teacher a few questions"""
+
+    def __init__(self, number: int, base_url: str, stats: LoadStats, deadline: float, think: float,
+                 chat_ratio: float, seed: int):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.stats = stats
+        self.deadline = deadline
+        self.think = think
+        self.chat_ratio = chat_ratio
+        self.random = random.Random(seed + number)
+        self.http = requests.Session()
+        self.session_id = f"loadtest-{seed}-{number}"
+
+    def call(self, endpoint: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=120, **kwargs)
+            ok = response.status_code < 400
+            data = response.json() if ok else None
+        except (requests.RequestException, ValueError):
+            ok, data = False, None
+        self.stats.record(endpoint, time.perf_counter() - started, ok)
+        return data
+
+    def pause(self):
+        if self.think > 0:
+            time.sleep(min(self.random.expovariate(1 / self.think), max(0.0, self.deadline - time.time())))
+
+    def run(self):
+        chapters = self.call("chapters", "GET", "/api/chapters") or []
+        while chapters and time.time() < self.deadline:
+            chapter_name = self.random.choice(chapters)["chapter_name"]
+            # Like the Dash app: the chapter's manifest, then each topic's content on its own
+            manifest = self.call("manifest", "GET", f"/api/chapters/{quote(chapter_name)}/manifest")
+            topics = ((manifest or {}).get("manifest") or {}).get("topics") or []
+            self.pause()
+            for topic in self.random.sample(topics, min(len(topics), 3)):
+                if time.time() >= self.deadline:
+                    return
+                section = (self.call("topic", "GET", f"/api/topic/{quote(topic['section_name'])}") or {}).get("section")
+                self.pause()
+                while section and self.random.random() < self.chat_ratio and time.time() < self.deadline:
+                    context = {"chapter": chapter_name, "topic": section.get("content") or ""}
+                    self.call("chat", "POST", "/api/chat", json={
+                        "message": self.random.choice(QUESTIONS),
+                        "context": context,
+                        "session_id": self.session_id,
+                    })
+                    self.pause()
+
+
+def start_local_server(args) -> str:
+    """Run the API in a background thread against the in-memory graph and the fake LLM"""
+    os.environ.setdefault("SOCRATIX_GRAPH_STORE", "memory")
+    os.environ.setdefault("SOCRATIX_LLM_MODE", "fake")
+    os.environ.setdefault("SOCRATIX_FAKE_LLM_LATENCY", str(args.llm_latency))
+    os.environ.setdefault("SOCRATIX_CHECKPOINT_DB", os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite"))
+    os.environ.setdefault("SOCRATIX_EMBEDDING_CACHE_DIR", "")
+    if args.store_path:
+        os.environ.setdefault("SOCRATIX_GRAPH_STORE_PATH", args.store_path)
+    # The scheduler still enforces the provider budgets, so results reflect the account's rate limits
+    if args.llm_rpm:
+        os.environ["SOCRATIX_LLM_RPM"] = str(args.llm_rpm)
+    if args.llm_tpm:
+        os.environ["SOCRATIX_LLM_TPM"] = str(args.llm_tpm)
+    # Imported only now, as the settings above are read at import time
+    from werkzeug.serving import make_server
+    import api
+
+    api.warm_up(connect=False)
+    server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def print_report(report: dict):
+    print(f"\n{report['requests']} requests in {report['elapsed_s']}s: "
+          f"{report['throughput_rps']} req/s, {report['error_rate'] * 100:.2f}% errors\n")
+    print(f"{'endpoint':<10}{'requests':>10}{'req/s':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<10}{row['requests']:>10}{row['throughput_rps']:>9}{row['error_rate'] * 100:>8.2f}%"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    for model, row in report.get("llm_scheduler", {}).items():
+        print(f"\nLLM queue {model}: {row['granted']} calls, {row['waited']} waited {row['wait_seconds']}s in total, "
+              f"max {row['max_waiting']} waiting")
+
+
+def main(args):
+    base_url = args.url.rstrip("/") if args.url else start_local_server(args)
+    print(f"Driving {base_url} with {args.students} students for {args.duration}s")
+    stats = LoadStats()
+    started = time.time()
+    deadline = started + args.duration
+    students = []
+    for number in range(args.students):
+        student = Student(number, base_url, stats, deadline, args.think, args.chat_ratio, args.seed)
+        student.start()
+        students.append(student)
+        # Spread the arrivals over the ramp-up period
+        time.sleep(args.ramp_up / max(args.students, 1))
+    for student in students:
+        student.join()
+    report = stats.report(time.time() - started)
+    if not args.url:
+        from llm_scheduler import get_scheduler
+        report["llm_scheduler"] = get_scheduler().stats()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test the Socratix API with simulated students')
+    parser.add_argument('--url', help='Base URL of a running API (default: run one in-process with fakes)')
+    parser.add_argument('--students', type=int, default=10, help='Concurrent students')
+    parser.add_argument('--duration', type=float, default=30, help='Test duration in seconds')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Seconds over which students join')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean think time between requests in seconds')
+    parser.add_argument('--chat-ratio', type=float, default=0.6, help='Chance of asking another question about a topic')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Fake LLM latency in seconds (in-process only)')
+    parser.add_argument('--llm-rpm', type=int, help='LLM requests per minute budget (in-process only)')
+    parser.add_argument('--llm-tpm', type=int, help='LLM tokens per minute budget (in-process only)')
+    parser.add_argument('--store-path', help='JSON curriculum for the in-memory graph (in-process only)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--json', help='Also write the report to this file')
+
+    main(parser.parse_args())
@@ -0,0 +1,43 @@
+"""In-process metrics for chat turns."""
+import threading
+import time
+from collections import Counter, deque
+
+from tracing import observe
+
+_lock = threading.Lock()
+_recent_turns = deque(maxlen=1000)
+_path_counts = Counter()
+
+
+def record_turn(session_id: str, path: str, latency: float, llm_calls: int) -> dict:
+    """
+    Record how one chat turn was answered.
+
+    Args:
+        session_id (str): Conversation thread of the turn
+        path (str): How the answer was produced ("post", "inline", "node", "node-skipped" or "cache")
+        latency (float): Wall-clock duration of the turn in seconds
+        llm_calls (int): Number of LLM calls made for the turn
+
+    Returns:
+        dict: The recorded turn metrics
+    """
+    turn = {
+        "session_id": session_id,
+        "path": path,
+        "latency_ms": round(latency * 1000, 1),
+        "llm_calls": llm_calls,
+        "time": time.time(),
+    }
+    with _lock:
+        _recent_turns.append(turn)
+        _path_counts[path] += 1
+    observe("turn", path, latency)
+    return turn
+
+
+def turn_summary(limit: int = 50) -> dict:
+    """Return per-path turn counts and the most recent turns"""
+    with _lock:
+        return {"paths": dict(_path_counts), "recent": list(_recent_turns)[-limit:]}
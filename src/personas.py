@@ -0,0 +1,70 @@
+"""Student personas loaded once from profiles/students.json, with their prompt fragments precompiled."""
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+import config
+from prompts import PERSONA_PROMPT
+
+
+class Persona:
+    """One student profile and the prompt text derived from it"""
+
+    def __init__(self, student_id: str, profile: dict):
+        self.id = student_id
+        self.name = profile.get("name", student_id)
+        self.profile = profile
+        # Compact, key-stable JSON keeps the prompt short and byte-identical across requests
+        self.profile_json = json.dumps(profile, separators=(",", ":"), ensure_ascii=False)
+        self.prompt = PERSONA_PROMPT.format(name=self.name, profile=self.profile_json)
+        self.system_message = {"role": "system", "content": self.prompt}
+
+    def to_dict(self) -> dict:
+        return {"student_id": self.id, "name": self.name}
+
+
+def slugify(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+class PersonaRegistry:
+    """
+    Personas indexed by student ID.
+
+    An entry's ID is its "student_id" field, or else the slug of the persona's name
+    (eg. "meera-sharma").
+    """
+
+    def __init__(self, students: list):
+        self.personas = {}
+        for student in students:
+            profile = student["persona"]
+            student_id = str(student.get("student_id") or slugify(profile["name"]))
+            self.personas[student_id] = Persona(student_id, profile)
+        self.ids = sorted(self.personas)
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def get(self, student_id):
+        return self.personas.get(str(student_id)) if student_id else None
+
+    def for_session(self, session_id: str) -> Persona:
+        """Persona for a session that did not name a student; stable for the whole session"""
+        digest = hashlib.sha1(str(session_id).encode("utf-8")).digest()
+        return self.personas[self.ids[int.from_bytes(digest[:4], "big") % len(self.ids)]]
+
+    def resolve(self, student_id, session_id: str) -> Persona:
+        return self.get(student_id) or self.for_session(session_id)
+
+    def list(self) -> list:
+        return [self.personas[student_id].to_dict() for student_id in self.ids]
+
+
+@lru_cache(maxsize=None)
+def get_persona_registry() -> PersonaRegistry:
+    """Return the process-wide persona registry"""
+    return PersonaRegistry.from_file(config.PROFILES_PATH)
@@ -0,0 +1,127 @@
+"""Prerequisite DAG of CONCEPT nodes with cached transitive closures and learning paths."""
+import numpy as np
+
+import config
+from cached_loader import CachedLoader
+from graph_store import get_graph_store
+
+
+def concept_key(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+class PrerequisiteGraph:
+    """
+    Concepts and their prerequisites as a compact CSR adjacency (int32 `indptr` / `indices`).
+
+    Edges point from a concept to the concepts it requires. `rank` holds each concept's position
+    in a topological order (prerequisites first); edges closing a cycle are left out of the order.
+    """
+
+    def __init__(self, rows):
+        self.names, self.descriptions, self.ids = [], [], {}
+        edges = {}
+        for name, description, prerequisites in rows:
+            node = self._node(name, description)
+            for prerequisite in (prerequisites or "").split(","):
+                if prerequisite.strip() and prerequisite.strip().upper() != "NULL":
+                    edges.setdefault(node, set()).add(self._node(prerequisite.strip()))
+
+        size = len(self.names)
+        self.indptr = np.zeros(size + 1, dtype=np.int32)
+        for node, targets in edges.items():
+            targets.discard(node)
+            self.indptr[node + 1] = len(targets)
+        np.cumsum(self.indptr, out=self.indptr)
+        self.indices = np.zeros(self.indptr[-1], dtype=np.int32)
+        for node, targets in edges.items():
+            self.indices[self.indptr[node]:self.indptr[node + 1]] = sorted(targets)
+        self.rank = self._topological_rank()
+        self._closures = {}
+
+    def _node(self, name, description=None):
+        key = concept_key(name)
+        if key not in self.ids:
+            self.ids[key] = len(self.names)
+            self.names.append(str(name).strip())
+            self.descriptions.append(description)
+        elif description and not self.descriptions[self.ids[key]]:
+            self.descriptions[self.ids[key]] = description
+        return self.ids[key]
+
+    def _topological_rank(self):
+        """Kahn's algorithm over prerequisite -> concept edges; nodes stuck in cycles go last"""
+        size = len(self.names)
+        pending = np.diff(self.indptr).astype(np.int64)
+        dependents = [[] for _ in range(size)]
+        for node in range(size):
+            for prerequisite in self.indices[self.indptr[node]:self.indptr[node + 1]]:
+                dependents[prerequisite].append(node)
+        ready = [node for node in range(size) if pending[node] == 0]
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for dependent in dependents[node]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        placed = set(order)
+        order.extend(node for node in range(size) if node not in placed)
+        rank = np.empty(size, dtype=np.int32)
+        rank[np.asarray(order, dtype=np.int64)] = np.arange(size, dtype=np.int32)
+        return rank
+
+    def find(self, name: str):
+        """Return the node id of a concept name, or None"""
+        return self.ids.get(concept_key(name))
+
+    def prerequisites(self, node: int):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def closure(self, node: int):
+        """All direct and indirect prerequisites of a concept, cached per concept"""
+        cached = self._closures.get(node)
+        if cached is None:
+            seen = np.zeros(len(self.names), dtype=bool)
+            stack = list(self.prerequisites(node))
+            while stack:
+                current = stack.pop()
+                if seen[current] or current == node:
+                    continue
+                seen[current] = True
+                stack.extend(self.prerequisites(current))
+            cached = np.flatnonzero(seen).astype(np.int32)
+            self._closures[node] = cached
+        return cached
+
+    def learning_path(self, node: int):
+        """Every prerequisite of a concept in study order, followed by the concept itself"""
+        closure = self.closure(node)
+        return list(closure[np.argsort(self.rank[closure], kind="stable")]) + [node]
+
+    def describe(self, node: int) -> dict:
+        return {"concept_name": self.names[node], "concept_description": self.descriptions[node]}
+
+
+def load_prerequisite_graph() -> PrerequisiteGraph:
+    graph = PrerequisiteGraph(get_graph_store().prerequisite_rows())
+    print(f"Prerequisite graph holds {len(graph.names)} concepts")
+    return graph
+
+
+prerequisite_graph = CachedLoader(load_prerequisite_graph, config.CONCEPT_INDEX_REFRESH_INTERVAL)
+
+
+def get_prerequisite_graph() -> PrerequisiteGraph:
+    """Return the prerequisite graph, rebuilt from the knowledge graph once it is older than the refresh interval"""
+    return prerequisite_graph.get()
+
+
+def get_learning_path(name: str):
+    """Concepts to study, in order, to understand `name` (ending with `name` itself), or None if unknown"""
+    graph = get_prerequisite_graph()
+    node = graph.find(name)
+    if node is None:
+        return None
+    return [graph.describe(i) for i in graph.learning_path(node)]
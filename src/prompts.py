@@ -11,7 +11,7 @@ Here are the rules:
 2. If the student has answered correctly on the foundation concept, then you can question the student on the next concept.
 3. If the student has answered correctly all the foundation concepts, then you can explain him the topic.    
 4. If the student has not answered the question correctly or not aware of the concept ,for atleast 2 times, then you can explain the concept to the student.    
-5. Make sure you explain anything in a personalized way, aligned to the student's profile. Always use PersonalizedNarrator tool to explain the topic.
+5. Make sure you explain anything in a personalized way, aligned to the student's profile.
 
 
 """
@@ -40,4 +40,54 @@ For eg. If a person likes football, you can explain the topic in a way that is r
 topic: {topic}
 student's profile: {profile}
 
-"""
\ No newline at end of file
+"""
+
+POST_PERSONALIZATION_PROMPT = """
+Always use PersonalizedNarrator tool to explain the topic.
+"""
+
+INLINE_PERSONALIZATION_PROMPT = """
+Personalize every answer yourself, following the student's profile above: change your tone and language to match the student,
+and use their hobbies and interests in examples and analogies (eg. a student who likes football gets a football analogy).
+Your answer goes to the student as it is.
+"""
+
+NARRATOR_NODE_PROMPT = """
+Longer explanations are personalized for the student after you answer, so answer plainly.
+"""
+
+HISTORY_SUMMARY_PROMPT = """
+You are keeping notes on a tutoring conversation between a socratic AI teacher and a student.
+Update the running summary with the new part of the conversation.
+Keep what the student already understands, what they struggled with, which foundation concepts were checked,
+and any open question the teacher asked. Be brief and factual. DO NOT Hallucinate.
+
+running summary: {summary}
+
+new part of the conversation:
+{conversation}
+"""
+
+TEACHER_TOOLS_PROMPT = """
+you have access to the following tools:
+{tools}
+"""
+
+# Listed in TEACHER_TOOLS_PROMPT for the tools bound to the teacher model
+TEACHER_TOOL_DESCRIPTIONS = {
+    "QuestionCreator": "This tool is used to create one or more questions based on the foundation concepts and the content of the topic.",
+    "FoundationConceptFetcher": "This tool is used to get the related concepts and prerequisites for the topic.",
+    "PersonalizedNarrator": "This tool is used to create a personalized narration based on the student's profile.",
+    "PrerequisiteFinder": "This tool is used to get the ordered learning path (all prerequisites) for a concept.",
+}
+
+PERSONA_PROMPT = """The student you are talking to is {name}. Here is their profile:
+{profile}
+
+Formulate your responses in a way that engages the student and aligns with their learning style, weaknesses, and strengths, current knowledge, interests, and goals.
+"""
+
+TOPIC_PROMPT = """The topic currently being taught is:
+{topic}
+guide the student to understand the topic.
+"""
@@ -0,0 +1,59 @@
+"""Question bank generated at ingest time (kb/QuestionBankCreator.py), served by concept."""
+import re
+
+import config
+from cached_loader import CachedLoader
+from graph_store import get_graph_store
+from prerequisites import concept_key
+
+
+class QuestionBank:
+    """Stored questions per concept, looked up by the concept names mentioned in a request"""
+
+    def __init__(self, rows):
+        self.questions = {}
+        for name, questions in rows:
+            self.questions.setdefault(concept_key(name), list(questions))
+        # Longest names first, so "electric field lines" wins over "electric field"
+        self.keys = sorted(self.questions, key=len, reverse=True)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def questions_for(self, foundation_concepts: str, per_concept: int = 3) -> tuple:
+        """
+        Questions for the known concepts among the comma-separated `foundation_concepts`,
+        and the names that matched no known concept (to be asked of the LLM).
+        """
+        questions, unmatched = [], []
+        for name in foundation_concepts.split(","):
+            key = concept_key(name)
+            if not key:
+                continue
+            if key in self.questions:
+                questions.extend(self.questions[key][:per_concept])
+                continue
+            # A name may still mention a known concept ("Newton's second law of motion"), as whole words only
+            matched = False
+            for known in self.keys:
+                pattern = rf"\b{re.escape(known)}\b"
+                if re.search(pattern, key):
+                    questions.extend(self.questions[known][:per_concept])
+                    key = re.sub(pattern, " ", key)
+                    matched = True
+            if not matched:
+                unmatched.append(name.strip())
+        return questions, unmatched
+
+def load_question_bank() -> QuestionBank:
+    bank = QuestionBank(get_graph_store().question_rows())
+    print(f"Question bank holds questions for {len(bank)} concepts")
+    return bank
+
+
+question_bank = CachedLoader(load_question_bank, config.CONCEPT_INDEX_REFRESH_INTERVAL)
+
+
+def get_question_bank() -> QuestionBank:
+    """Return the question bank, reloaded from the knowledge graph once it is older than the refresh interval"""
+    return question_bank.get()
@@ -0,0 +1,89 @@
+"""Semantic cache of first-turn answers, keyed by section, persona and question embedding."""
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+import config
+
+
+def section_key(context: dict) -> str:
+    """Identify the section being studied by its chapter and content"""
+    text = f"{context.get('chapter', '')}\n{context.get('topic', '')}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class SemanticResponseCache:
+    """
+    Answers cached per (section, persona), matched by cosine similarity of the question embeddings.
+
+    Entries older than `ttl` seconds are ignored and dropped, and when more than `max_entries`
+    answers are cached the least recently used one is evicted.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # entry id -> (bucket, unit embedding, answer, created)
+        self.buckets = {}  # (section, persona) -> [entry id]
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _drop(self, entry_id):
+        bucket = self.entries.pop(entry_id)[0]
+        self.buckets[bucket].remove(entry_id)
+        if not self.buckets[bucket]:
+            del self.buckets[bucket]
+
+    def lookup(self, section: str, persona: str, embedding):
+        """Return the cached answer closest to `embedding` if it is similar enough, else None"""
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        now = time.time()
+        with self.lock:
+            for entry_id in list(self.buckets.get((section, persona), [])):
+                if now - self.entries[entry_id][3] > self.ttl:
+                    self._drop(entry_id)
+            entry_ids = self.buckets.get((section, persona), [])
+            if entry_ids:
+                matrix = np.stack([self.entries[entry_id][1] for entry_id in entry_ids])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id = entry_ids[best]
+                    self.entries.move_to_end(entry_id)
+                    self.counts["hits"] += 1
+                    return self.entries[entry_id][2]
+            self.counts["misses"] += 1
+            return None
+
+    def store(self, section: str, persona: str, embedding, answer: str):
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self.lock:
+            entry_id = next(self.ids)
+            self.entries[entry_id] = ((section, persona), vector, answer, time.time())
+            self.buckets.setdefault((section, persona), []).append(entry_id)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+                self.counts["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counts, "entries": len(self.entries), "buckets": len(self.buckets)}
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    """Return the process-wide response cache configured in `config`"""
+    return SemanticResponseCache(
+        threshold=config.RESPONSE_CACHE_THRESHOLD,
+        ttl=config.RESPONSE_CACHE_TTL,
+        max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    )
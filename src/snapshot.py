@@ -0,0 +1,151 @@
+"""
+Read-only curriculum snapshots: the whole knowledge graph in one file, served without Neo4j.
+
+    python snapshot.py export curriculum.snap    # from the graph store configured by SOCRATIX_GRAPH_STORE
+    python snapshot.py info curriculum.snap
+
+Serve a snapshot with SOCRATIX_GRAPH_STORE=snapshot and SOCRATIX_GRAPH_STORE_PATH=curriculum.snap.
+
+A snapshot is an 8-byte magic, the header length as a little-endian uint64, the zlib-compressed
+JSON header (version, chapters with their sections and subsections, concepts with their
+prerequisites and questions), zero padding to a 64-byte boundary and finally the concept
+embeddings, unit-normalized, as one float32 matrix that is memory-mapped when served.
+"""
+import argparse
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from graph_store import InMemoryGraphStore
+
+MAGIC = b"SCTXSNP1"
+ALIGNMENT = 64
+
+
+def write_snapshot(data: dict, path: str) -> dict:
+    """Write `data` (the layout of `InMemoryGraphStore`) to a snapshot file; returns its header"""
+    concepts, embeddings = [], []
+    for concept in data.get("concepts", []):
+        concept = dict(concept)
+        embedding = concept.pop("embedding", None)
+        concept["embedding_row"] = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            concept["embedding_row"] = len(embeddings)
+            embeddings.append(vector / (np.linalg.norm(vector) or 1.0))
+        concepts.append(concept)
+    matrix = np.ascontiguousarray(np.stack(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32))
+    header = {
+        "version": str(data.get("version") or "unversioned"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "chapters": data["chapters"],
+        "concepts": concepts,
+        "embeddings": {"rows": int(matrix.shape[0]), "dim": int(matrix.shape[1]), "dtype": "float32"},
+    }
+    compressed = zlib.compress(json.dumps(header, separators=(",", ":")).encode("utf-8"), 6)
+    offset = embeddings_offset(len(compressed))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(compressed)))
+        f.write(compressed)
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(matrix.tobytes())
+    os.replace(tmp_path, path)
+    return header
+
+
+def embeddings_offset(header_length: int) -> int:
+    """The embedding block starts at the first 64-byte boundary after the header"""
+    return -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+
+def read_header(path: str) -> tuple:
+    """(header, offset of the embedding block) of a snapshot file"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a curriculum snapshot")
+        (length,) = struct.unpack("<Q", f.read(8))
+        return json.loads(zlib.decompress(f.read(length)).decode("utf-8")), embeddings_offset(length)
+
+
+class SnapshotGraphStore(InMemoryGraphStore):
+    """
+    The knowledge graph served read-only from a snapshot file.
+
+    Chapters and concepts are loaded into memory; the embeddings stay memory-mapped, so replicas
+    share them through the page cache and start without reading them.
+    """
+
+    def __init__(self, path: str):
+        header, offset = read_header(path)
+        block = header["embeddings"]
+        if block["rows"]:
+            self.embeddings = np.memmap(path, dtype=np.float32, mode="r", offset=offset,
+                                        shape=(block["rows"], block["dim"]))
+        else:
+            self.embeddings = np.zeros((0, block["dim"]), dtype=np.float32)
+        concepts = []
+        for concept in header["concepts"]:
+            row = concept.get("embedding_row")
+            concepts.append({**concept, "embedding": self.embeddings[row] if row is not None else None})
+        self.path = path
+        self.created_at = header["created_at"]
+        super().__init__({"version": header["version"], "chapters": header["chapters"], "concepts": concepts})
+        self.embedded = [c for c in concepts if c["embedding"] is not None]
+
+    @classmethod
+    def from_file(cls, path: str):
+        return cls(path)
+
+    def concept_matrix(self) -> tuple:
+        """(names, descriptions, unit-normalized embedding matrix) of the concepts that have embeddings"""
+        return ([c["concept_name"] for c in self.embedded], [c["concept_description"] for c in self.embedded],
+                self.embeddings)
+
+    def similar_concepts(self, embedding, top_n: int = 3) -> list:
+        if not self.embedded:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = self.embeddings @ (query / (np.linalg.norm(query) or 1.0))
+        return [(self.embedded[i]["concept_name"], self.embedded[i]["concept_description"])
+                for i in np.argsort(-scores)[:top_n]]
+
+
+def describe(path: str) -> dict:
+    header, offset = read_header(path)
+    return {
+        "path": path,
+        "bytes": os.path.getsize(path),
+        "version": header["version"],
+        "created_at": header["created_at"],
+        "chapters": len(header["chapters"]),
+        "sections": sum(len(chapter["sections"]) for chapter in header["chapters"]),
+        "subsections": sum(len(section.get("subsections") or []) for chapter in header["chapters"]
+                           for section in chapter["sections"]),
+        "concepts": len(header["concepts"]),
+        "embeddings": {**header["embeddings"], "offset": offset},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export or inspect a read-only curriculum snapshot')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='Write the configured knowledge graph to a snapshot file')
+    export_parser.add_argument('path')
+    info_parser = commands.add_parser('info', help='Describe a snapshot file')
+    info_parser.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        from graph_store import get_graph_store
+
+        started = time.time()
+        write_snapshot(get_graph_store().export(), args.path)
+        print(f"Exported the knowledge graph in {time.time() - started:.1f}s")
+    print(json.dumps(describe(args.path), indent=2))
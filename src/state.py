@@ -11,5 +11,7 @@ class State(TypedDict):
     # in the annotation defines how this state key should be updated
     # (in this case, it appends messages to the list, rather than overwriting them)
     messages: Annotated[list, add_messages]
-
-
+    # Set by the narrator node when it personalized the last answer
+    narrated: bool
+    # Running summary of the turns folded out of `messages`
+    summary: str
@@ -0,0 +1,29 @@
+"""
+Where the API keeps the state every worker process must agree on: conversation checkpoints and chat history.
+
+SOCRATIX_STATE_STORE=sqlite (the default) keeps both in the SQLite file SOCRATIX_CHECKPOINT_DB,
+in WAL mode, so any number of API workers on one host serve the same sessions without sticky
+routing. "memory" keeps them in the process, for a single worker and for tests.
+
+Everything else a worker holds is either derived from the knowledge graph (curriculum and
+response caches, concept index, prerequisite graph) and safe to hold per process, or
+per-process telemetry. Personas are picked from a hash of the session id, so every worker
+picks the same one.
+"""
+import sqlite3
+
+import config
+
+
+def is_shared() -> bool:
+    return config.STATE_STORE == "sqlite"
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """A connection to the shared state database, usable from every thread and process"""
+    conn = sqlite3.connect(path or config.CHECKPOINT_DB, check_same_thread=False,
+                           timeout=config.STATE_BUSY_TIMEOUT)
+    # Readers no longer block the writer (and the other way round); writes are still serialized
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
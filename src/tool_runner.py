@@ -0,0 +1,66 @@
+"""Graph node that runs the chatbot's tool calls, concurrently when it asks for several at once."""
+import json
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import get_executor_for_config
+
+import config as settings
+from tracing import span
+
+
+def tool_error_message(error: Exception) -> str:
+    # Same wording as langgraph's ToolNode, so the model can correct its call
+    return f"Error: {repr(error)}\n Please fix your mistakes."
+
+
+def to_tool_message(tool_call: dict, output) -> ToolMessage:
+    content = output if isinstance(output, str) else json.dumps(output, default=str)
+    return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"])
+
+
+class TeacherToolRunner:
+    """
+    Runs the tool calls of the chatbot's last message.
+
+    Each tool is a pydantic model whose fields are the tool arguments; the call builds the
+    model from the arguments and runs its `_run` method. Independent calls run
+    at the same time, capped at `max_concurrency` per turn, and their results come back in
+    the order the model asked for them.
+    """
+
+    def __init__(self, tools: list, max_concurrency: int = None):
+        self.tools_by_name = {tool.__name__: tool for tool in tools}
+        self.max_concurrency = max_concurrency or settings.TOOL_CONCURRENCY
+
+    def tool_calls(self, state: dict) -> list:
+        return state["messages"][-1].tool_calls
+
+    def build(self, tool_call: dict):
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            raise ValueError(f"{tool_call['name']} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].")
+        return tool(**tool_call["args"])
+
+    def run_one(self, tool_call: dict) -> ToolMessage:
+        try:
+            with span("tool", tool_call["name"]):
+                output = self.build(tool_call)._run(**tool_call["args"])
+        except Exception as e:
+            print(f"Tool {tool_call['name']} failed: {str(e)}")
+            output = tool_error_message(e)
+        return to_tool_message(tool_call, output)
+
+    def invoke(self, state: dict, config: RunnableConfig) -> dict:
+        tool_calls = self.tool_calls(state)
+        if len(tool_calls) == 1:
+            return {"messages": [self.run_one(tool_calls[0])]}
+        # The executor copies the run context into each thread so callbacks and tracing still apply
+        limit = min(self.max_concurrency, len(tool_calls))
+        with get_executor_for_config({**config, "max_concurrency": limit}) as executor:
+            outputs = list(executor.map(self.run_one, tool_calls))
+        return {"messages": outputs}
+
+    def as_node(self) -> RunnableLambda:
+        """The runner as a graph node (added under the node name "tools")"""
+        return RunnableLambda(self.invoke, name="run_tools")
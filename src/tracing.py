@@ -0,0 +1,204 @@
+"""Latency spans and token counts for the chat pipeline, aggregated for the Prometheus /api/metrics endpoint."""
+import bisect
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import config
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Upper bounds (seconds) of the Prometheus histogram buckets; unlike quantiles, these add up across workers
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+
+
+class LatencySummary:
+    """Count, sum and histogram buckets of one span, and quantiles over its most recent observations"""
+
+    def __init__(self, window: int):
+        self.recent = deque(maxlen=window)
+        self.buckets = [0] * len(BUCKETS)  # observations per bucket, not cumulative
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.recent.append(seconds)
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        if bucket < len(BUCKETS):
+            self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.errors += 1 if error else 0
+
+    def quantiles(self) -> dict:
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+# (kind, name) -> LatencySummary, where kind is "turn", "node", "tool", "llm" or "neo4j"
+_spans = {}
+# (model, "prompt" | "completion") -> tokens
+_tokens = defaultdict(int)
+
+
+def observe(kind: str, name: str, seconds: float, error: bool = False):
+    """Record one finished span"""
+    with _lock:
+        summary = _spans.get((kind, name))
+        if summary is None:
+            summary = _spans[(kind, name)] = LatencySummary(config.TRACE_WINDOW)
+        summary.observe(seconds, error)
+
+
+def count_tokens(model: str, prompt_tokens: int, completion_tokens: int = 0):
+    with _lock:
+        _tokens[(model, "prompt")] += prompt_tokens or 0
+        _tokens[(model, "completion")] += completion_tokens or 0
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Time the block as a span of the given kind"""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        observe(kind, name, time.perf_counter() - started, error)
+
+
+def token_usage(response) -> tuple:
+    """(model, prompt tokens, completion tokens) of an LLMResult"""
+    output = response.llm_output or {}
+    usage = output.get("token_usage")
+    model = output.get("model_name")
+    if usage:
+        return model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    # Streamed responses carry their usage on the message instead
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None)
+            if metadata:
+                model = model or (message.response_metadata or {}).get("model_name")
+                return model, metadata.get("input_tokens", 0), metadata.get("output_tokens", 0)
+    return model, 0, 0
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain callbacks into spans: graph nodes and chat model calls with their token counts"""
+
+    def __init__(self):
+        self.started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name", "chat_model")
+        self.started[run_id] = ("llm", model, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self.started.pop(run_id, None)
+        model, prompt_tokens, completion_tokens = token_usage(response)
+        if started:
+            model = model or started[1]
+            observe("llm", started[1], time.perf_counter() - started[2])
+        count_tokens(model or "unknown", prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started = self.started.pop(run_id, None)
+        if started:
+            observe("llm", started[1], time.perf_counter() - started[2], error=True)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs):
+        # Graph nodes run as chains named after the node; "__start__" and the like are LangGraph's own
+        if name and not name.startswith("__") and (metadata or {}).get("langgraph_node") == name:
+            parent = self.started.get(parent_run_id)
+            # A runnable inside the node may carry the node's name too; the node's own span covers it
+            if parent is None or parent[:2] != ("node", name):
+                self.started[run_id] = ("node", name, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        started = self.started.pop(run_id, None)
+        if started:
+            observe(started[0], started[1], time.perf_counter() - started[2])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        started = self.started.pop(run_id, None)
+        if started:
+            observe(started[0], started[1], time.perf_counter() - started[2], error=True)
+
+
+@lru_cache(maxsize=None)
+def get_tracing_handler() -> TracingCallbackHandler:
+    """Return the process-wide tracing callback handler"""
+    return TracingCallbackHandler()
+
+
+def span_summary() -> dict:
+    """Span latencies in milliseconds and token counts, as JSON"""
+    with _lock:
+        spans = {
+            f"{kind}:{name}": {
+                "count": summary.count,
+                "errors": summary.errors,
+                **{f"p{int(q * 100)}_ms": round(value * 1000, 1) for q, value in summary.quantiles().items()},
+            }
+            for (kind, name), summary in _spans.items()
+        }
+        tokens = {f"{model}:{kind}": count for (model, kind), count in _tokens.items()}
+    return {"spans": spans, "tokens": tokens}
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def labels(**values) -> str:
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in values.items()) + "}"
+
+
+def prometheus_text(gauges: dict = None) -> str:
+    """
+    Render spans and token counts in the Prometheus text exposition format.
+
+    Args:
+        gauges (dict, optional): Extra gauges as {metric name: {(label name, label value): value}}
+    """
+    lines = [
+        "# HELP socratix_span_duration_seconds Duration of chat pipeline spans",
+        "# TYPE socratix_span_duration_seconds histogram",
+    ]
+    with _lock:
+        spans = [(kind, name, list(summary.buckets), summary.count, summary.total, summary.errors)
+                 for (kind, name), summary in sorted(_spans.items())]
+        tokens = sorted(_tokens.items())
+    for kind, name, buckets, count, total, errors in spans:
+        cumulative = 0
+        for bound, observations in zip(BUCKETS, buckets):
+            cumulative += observations
+            lines.append(f"socratix_span_duration_seconds_bucket{labels(kind=kind, name=name, le=bound)} {cumulative}")
+        lines.append(f"socratix_span_duration_seconds_bucket{labels(kind=kind, name=name, le='+Inf')} {count}")
+        lines.append(f"socratix_span_duration_seconds_sum{labels(kind=kind, name=name)} {total:.6f}")
+        lines.append(f"socratix_span_duration_seconds_count{labels(kind=kind, name=name)} {count}")
+    lines += ["# HELP socratix_span_errors_total Spans that ended with an exception",
+              "# TYPE socratix_span_errors_total counter"]
+    for kind, name, buckets, count, total, errors in spans:
+        lines.append(f"socratix_span_errors_total{labels(kind=kind, name=name)} {errors}")
+    lines += ["# HELP socratix_llm_tokens_total LLM tokens used", "# TYPE socratix_llm_tokens_total counter"]
+    for (model, kind), count in tokens:
+        lines.append(f"socratix_llm_tokens_total{labels(model=model, type=kind)} {count}")
+    for metric, values in (gauges or {}).items():
+        lines.append(f"# TYPE {metric} gauge")
+        for (label, label_value), value in sorted(values.items()):
+            lines.append(f"{metric}{labels(**{label: label_value})} {value}")
+    return "\n".join(lines) + "\n"